@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from app.core.cache import get_or_compute
+from app.services.cohort_dataset import load_snapshot
+from app.services.exposure_response import CORRELATION_METHODS, exposure_response
+
+router = APIRouter()
+
+
+def compute_exposure_response(analyte: str, method: str):
+    return exposure_response(load_snapshot(), analyte, method)
+
+
+@router.get("/analytics/exposure-response")
+async def get_exposure_response(analyte: str = "ADC", method: str = "spearman"):
+    """Dose-proportionality fits, dose-normalised exposure and AE% / exposure correlations."""
+    if method not in CORRELATION_METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of {CORRELATION_METHODS}")
+
+    # Cached per data version; concurrent misses share one computation
+    result = await get_or_compute(("exposure_response", analyte, method), compute_exposure_response, analyte, method)
+    return JSONResponse(content=result)
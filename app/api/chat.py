@@ -1,27 +1,36 @@
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from app.models.chat import UserQuery, ChatResponse
-from app.services.gemini_service import gemini_service, GeminiService
+from app.services.gemini_service import gemini_service, GeminiService, format_basic_response
 from app.db.neo4j_client import neo4j_client, Neo4jClient
+from app.services.cypher_repair import execute_with_repair
+from app.services.fewshot import fewshot_index, format_examples
+from app.services.prompt_context import FULL_SCHEMA
+from app.services.cohort_normalizer import normalize_cohorts, plain_records
+from app.services.cohort_pages import ADC_NAMES_QUERY, DEFAULT_PAGE_SIZE, build_cohort_page_query, split_page
+from app.core.templates import templates, render_fragment
+from app.core.cache import get_or_compute
+from app.core.config import settings
+from app.core.singleflight import flight_key, normalize_text
+from app.core.admission import Overloaded, llm_pool
+from app.core.breaker import llm_breaker
+from app.core.log import get_logger
+from starlette.concurrency import run_in_threadpool
 from typing import Dict, List, Optional
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+log = get_logger(__name__)
 
 # Define schema hint for LLM
 def get_schema_hint() -> str:
     return """
-(:AntibodyDrugConjugate)-[:HAS_DOSAGE_COHORT]->(:DosageCohort)
+(:AntibodyDrugConjugate)-[:HAS_COHORT]->(:DosageCohort)
 (:DosageCohort)-[:HAS_AUC]->(:PK_Observation)
-(:DosageCohort)-[:HAS_CL]->(:PK_Observation)
 (:DosageCohort)-[:HAS_CMAX]->(:PK_Observation)
 (:DosageCohort)-[:HAS_TMAX]->(:PK_Observation)
 (:DosageCohort)-[:HAS_THALF]->(:PK_Observation)
 (:DosageCohort)-[:HAS_AUCLAST]->(:PK_Observation)
-(:DosageCohort)-[:HAS_GRADE]->(:GradeValue)
-(:DosageCohort)-[:EXPERIENCED_ADVERSE_EVENT]->(:AETermMention)
-(:AETermMention)-[:GeneralAEMentioned]->(:AdverseEventTerm)
+(:DosageCohort)-[:HAS_AE {patientPercentage, patientCount, grade, isDLT, drugRelated}]->(:AdverseEventTerm)
 (:AntibodyDrugConjugate)-[:USES_PAYLOAD_AGENT]->(:PayloadAgent)
 (:AntibodyDrugConjugate)-[:HAS_PAYLOAD_CLASS]->(:PayloadClass)
 (:AntibodyDrugConjugate)-[:HAS_LINKER_TYPE]->(:LinkerType)
@@ -30,76 +39,40 @@ def get_schema_hint() -> str:
 (:Study)-[:INVESTIGATES_ADC]->(:AntibodyDrugConjugate)
 """
 
+def run_cypher(query: str) -> List[Dict]:
+    # Generated queries run read-only: the server rejects any write, so a query that answers is a read
+    return list(plain_records(neo4j_client.stream_read(query)))
+
+def load_first_screen():
+    """ADC names plus the rendered first table page for the first ADC."""
+    unique_adcs = [record["ADC_Name"] for record in neo4j_client.stream_query(ADC_NAMES_QUERY)]
+    selected_adc = unique_adcs[0] if unique_adcs else None
+
+    # Render only the first page for the selected ADC; the page loads the rest from /cohorts
+    query, params = build_cohort_page_query(adc=selected_adc)
+    processed_data, next_cursor = split_page(
+        list(normalize_cohorts(neo4j_client.stream_query(query, **params))),
+        DEFAULT_PAGE_SIZE
+    )
+    table_html = render_fragment("_cohort_rows.html", ("first_page", selected_adc), data=processed_data)
+    return unique_adcs, table_html, next_cursor
+
 @router.get("/", response_class=HTMLResponse)
 async def get_chat_interface(request: Request):
     try:
-        query = """
-        MATCH (adc:AntibodyDrugConjugate)-[:HAS_COHORT]->(cohort:DosageCohort)
-        OPTIONAL MATCH (cohort)-->(pk:PK_Observation)
-        OPTIONAL MATCH (cohort)-[ae_rel:HAS_AE]->(ae:AdverseEventTerm)
-        WITH adc, cohort,
-             collect(DISTINCT {
-                 parameter: pk.parameter_name,
-                 analyte: pk.analyte_component,
-                 value: pk.value,
-                 unit: pk.unit
-             }) AS pk_data,
-             collect(DISTINCT {
-                 event: ae.name,
-                 grade: ae_rel.grade,
-                 count: ae_rel.patientCount,
-                 percent: ae_rel.patientPercentage,
-                 related: ae_rel.drugRelated
-             }) AS ae_data
-        WITH adc, cohort, pk_data, ae_data,
-             [item IN pk_data WHERE item.parameter = 'AUCinf' AND item.analyte = 'ADC'] AS aucinf_adc,
-             [item IN pk_data WHERE item.parameter = 'AUCinf' AND item.analyte = 'Free Payload'] AS aucinf_payload,
-             [item IN pk_data WHERE item.parameter = 'AUCinf' AND item.analyte = 'Total AB'] AS aucinf_totalab,
-             [item IN pk_data WHERE item.parameter = 'AUClast' AND item.analyte = 'ADC'] AS auclast_adc,
-             [item IN pk_data WHERE item.parameter = 'AUClast' AND item.analyte = 'Free Payload'] AS auclast_payload,
-             [item IN pk_data WHERE item.parameter = 'AUClast' AND item.analyte = 'Total AB'] AS auclast_totalab
-        RETURN
-            adc.name AS ADC_Name,
-            cohort.name AS Dosage,
-            [item IN pk_data WHERE item.parameter IS NOT NULL] AS PK_Parameters,
-            [item IN ae_data WHERE item.event IS NOT NULL] AS Adverse_Events,
-            CASE WHEN size(aucinf_adc) > 0 THEN aucinf_adc[0] ELSE {value: '', unit: ''} END AS AUCinf_ADC,
-            CASE WHEN size(aucinf_payload) > 0 THEN aucinf_payload[0] ELSE {value: '', unit: ''} END AS AUCinf_Payload,
-            CASE WHEN size(aucinf_totalab) > 0 THEN aucinf_totalab[0] ELSE {value: '', unit: ''} END AS AUCinf_TotalAb,
-            CASE WHEN size(auclast_adc) > 0 THEN auclast_adc[0] ELSE {value: '', unit: ''} END AS AUClast_ADC,
-            CASE WHEN size(auclast_payload) > 0 THEN auclast_payload[0] ELSE {value: '', unit: ''} END AS AUClast_Payload,
-            CASE WHEN size(auclast_totalab) > 0 THEN auclast_totalab[0] ELSE {value: '', unit: ''} END AS AUClast_TotalAb
-        ORDER BY ADC_Name, Dosage
-        """
-        results = await neo4j_client.run_query(query)
-        
-        # Process results for template
-        processed_data = []
-        for record in results:
-            entry = {
-                'ADC_Name': record['ADC_Name'],
-                'Dosage': record['Dosage'],
-                'PK_Parameters': {},
-                'Adverse_Events': record['Adverse_Events']
-            }
-            for pk in record['PK_Parameters']:
-                if pk['parameter'] and pk['analyte'] and pk['value'] != 'NOT FOUND':
-                    key = f"{pk['parameter']}_{pk['analyte']}"
-                    entry['PK_Parameters'][key] = {
-                        'value': pk['value'],
-                        'unit': pk['unit']
-                    }
-            processed_data.append(entry)
+        unique_adcs, table_html, next_cursor = await get_or_compute(("chat_interface",), load_first_screen)
         
         return templates.TemplateResponse(
             "index.html",
             {
                 "request": request,
-                "data": processed_data
+                "table_html": table_html,
+                "next_cursor": next_cursor,
+                "unique_adcs": unique_adcs
             }
         )
     except Exception as e:
-        print(f"Error loading data: {str(e)}")
+        log.exception("chat_interface_failed")
         return templates.TemplateResponse(
             "index.html",
             {
@@ -110,10 +83,23 @@ async def get_chat_interface(request: Request):
 
 @router.post("/ask", response_model=ChatResponse)
 async def ask_chatbot(query: UserQuery):
+    # Answers are cached per normalised question; identical questions in flight share one run.
+    # The root app caches its own /ask answers (plain dicts) in the same store, so keys are namespaced
+    key = flight_key("chat/ask", question=normalize_text(query.question))
+    return await get_or_compute(
+        key, answer_question, query,
+        ttl=settings.ANSWER_CACHE_TTL,
+        cache_if=lambda response: response.results[0].get("type") != "error"
+        and not response.results[0].get("degraded")
+    )
+
+async def answer_question(query: UserQuery) -> ChatResponse:
     try:
         # Generate Cypher query using LLM
         schema_hint = get_schema_hint()
-        cypher_query = await gemini_service.generate_cypher(query.question, schema_hint)
+        examples = format_examples(await run_in_threadpool(fewshot_index.select, query.question, settings.FEWSHOT_K))
+        async with llm_pool.slot():
+            cypher_query = await gemini_service.generate_cypher(query.question, schema_hint, examples)
         
         # Clean the Cypher query by removing markdown formatting if present
         if cypher_query.startswith("```"):
@@ -123,23 +109,13 @@ async def ask_chatbot(query: UserQuery):
             else:
                 cypher_query = ""
         
-        print("\n=== Generated Cypher Query ===")
-        print(cypher_query)
-        print("=============================\n")
-        
-        # Execute the query
-        results = await neo4j_client.run_query(cypher_query)
+        log.info("cypher_generated", query=cypher_query)
         
-        # Convert Neo4j results to Python types
-        formatted_results = []
-        for record in results:
-            record_dict = {}
-            for key, value in record.items():
-                if hasattr(value, 'to_dict'):
-                    record_dict[key] = value.to_dict()
-                else:
-                    record_dict[key] = value
-            formatted_results.append(record_dict)
+        # Execute the query, feeding errors or empty results back for repair against the live schema
+        generated = cypher_query
+        cypher_query, formatted_results = await execute_with_repair(
+            query.question, cypher_query, run_cypher, FULL_SCHEMA
+        )
         
         if not formatted_results:
             return ChatResponse(
@@ -149,6 +125,9 @@ async def ask_chatbot(query: UserQuery):
                     "type": "error"
                 }]
             )
+        # A generated query that found rows without a repair becomes a future few-shot example
+        if cypher_query == generated:
+            await run_in_threadpool(fewshot_index.add, query.question, cypher_query)
         
         # Generate conversational response using LLM
         prompt = f"""
@@ -172,7 +151,22 @@ Please provide a response that:
 
 Format the response in a natural, conversational way that feels like a friendly discussion.
 """
-        response = await gemini_service.generate_response(prompt, formatted_results)
+        degraded = ChatResponse(
+            query=cypher_query,
+            results=[{
+                "insights": format_basic_response(formatted_results),
+                "type": "insights",
+                "degraded": True
+            }]
+        )
+        if llm_pool.saturated() or llm_breaker.is_open():
+            # Under LLM load or outage, fall back to the plain formatted results
+            return degraded
+        try:
+            async with llm_pool.slot():
+                response = await run_in_threadpool(gemini_service.generate_response, prompt, formatted_results)
+        except Overloaded:
+            return degraded
         
         return ChatResponse(
             query=cypher_query,
@@ -181,11 +175,10 @@ Format the response in a natural, conversational way that feels like a friendly
                 "type": "insights"
             }]
         )
-    except Exception as e:
-        error_message = str(e)
-        print(f"\n=== Error ===")
-        print(error_message)
-        print("=============\n")
+    except Overloaded:
+        raise
+    except Exception:
+        log.exception("ask_failed", question=query.question)
         
         return ChatResponse(
             query="Error occurred",
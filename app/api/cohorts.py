@@ -0,0 +1,41 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from app.core.cache import get_or_compute
+from app.core.templates import render_fragment
+from app.db.neo4j_client import neo4j_client
+from app.services.cohort_normalizer import normalize_cohorts
+from app.services.cohort_pages import DEFAULT_PAGE_SIZE, build_cohort_page_query, split_page
+from typing import Optional
+
+router = APIRouter()
+
+
+@router.get("/cohorts")
+async def get_cohort_page(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    adc: Optional[str] = None,
+    ae: Optional[str] = None,
+    pk: Optional[str] = None,
+    format: str = "json",
+):
+    """Return one keyset-paginated page of the cohort table as JSON rows or table HTML."""
+    cache_key = ("cohorts", cursor, limit, adc, ae, pk, format)
+    try:
+        query, params = build_cohort_page_query(cursor=cursor, limit=limit, adc=adc, ae=ae, pk=pk)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Cached pages skip Neo4j; concurrent misses for the same page share one read
+    page = await get_or_compute(cache_key, load_cohort_page, cache_key, query, params, limit, format)
+    return JSONResponse(page)
+
+
+def load_cohort_page(cache_key, query: str, params: dict, limit: int, format: str) -> dict:
+    rows, next_cursor = split_page(list(normalize_cohorts(neo4j_client.stream_query(query, **params))), limit)
+
+    if format == "html":
+        page = {"html": render_fragment("_cohort_rows.html", cache_key, data=rows), "next_cursor": next_cursor}
+    else:
+        page = {"rows": [row.to_dict() for row in rows], "next_cursor": next_cursor}
+    return page
@@ -0,0 +1,83 @@
+import os
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
+from app.core.admission import llm_pool, render_pool, request_pool
+from app.core.breaker import llm_breaker, neo4j_breaker
+from app.core.config import settings
+from app.core.stages import stage_stats
+from app.core.log import handler as log_handler
+from app.core.memory import memory_watchdog, start_tracing, stop_tracing, take_snapshot
+from app.core.profiling import list_profiles, profile_file
+
+router = APIRouter()
+
+
+def _require_debug():
+    if not settings.DEBUG_ENDPOINTS:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.get("/metrics/memory")
+async def memory_metrics():
+    """RSS, watchdog state, admission pool load and log queue for this worker."""
+    memory_watchdog.sample()
+    return JSONResponse(content={
+        **memory_watchdog.stats(),
+        "pools": [pool.stats() for pool in (request_pool, llm_pool, render_pool)],
+        "log_queue": log_handler.stats(),
+    })
+
+
+@router.get("/metrics/breakers")
+async def breaker_metrics():
+    """Circuit breaker state for Neo4j and the LLM in this worker."""
+    return JSONResponse(content=[breaker.stats() for breaker in (neo4j_breaker, llm_breaker)])
+
+
+@router.get("/metrics/stages")
+async def stage_metrics():
+    """Per-stage latency of the staged handlers (e.g. /ask) in this worker."""
+    return JSONResponse(content=stage_stats.snapshot())
+
+
+@router.post("/debug/tracemalloc/start")
+async def tracemalloc_start(frames: int = 10):
+    _require_debug()
+    start_tracing(frames)
+    return JSONResponse(content={"tracing": True})
+
+
+@router.post("/debug/tracemalloc/stop")
+async def tracemalloc_stop():
+    _require_debug()
+    stop_tracing()
+    return JSONResponse(content={"tracing": False})
+
+
+@router.get("/debug/tracemalloc")
+async def tracemalloc_snapshot(limit: int = 25, key_type: str = "lineno"):
+    """Top allocations in this worker, and growth since the previous call."""
+    _require_debug()
+    if key_type not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="key_type must be lineno, filename or traceback")
+    return JSONResponse(content=take_snapshot(limit, key_type))
+
+
+@router.get("/debug/profiles")
+async def profiles():
+    """Stored request profiles with their stage timings, newest first."""
+    _require_debug()
+    return JSONResponse(content=list_profiles())
+
+
+@router.get("/debug/profiles/{profile_id}")
+async def download_profile(profile_id: str, format: str = "speedscope"):
+    """One profile as a speedscope file, collapsed stacks for flamegraph.pl, or its metadata."""
+    _require_debug()
+    if format not in ("speedscope", "collapsed", "meta"):
+        raise HTTPException(status_code=400, detail="format must be speedscope, collapsed or meta")
+    path = profile_file(profile_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=os.path.basename(path))
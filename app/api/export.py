@@ -0,0 +1,109 @@
+import re
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from app.core.admission import Overloaded
+from app.core.breaker import neo4j_breaker
+from app.core.config import settings
+from app.db.neo4j_client import neo4j_client
+from app.models.export import ExportQuery
+from app.services.cohort_normalizer import normalize_cohorts, plain_records
+from app.services.cohort_pages import cohort_filters, where_clause
+from app.services.cohort_rollup import build_rollup_query
+from app.services.cypher_repair import explain_warnings
+from app.services.exporters import EXPORT_FORMATS, stream_export
+from app.services.fewshot import WRITE_CLAUSES
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, Iterator, Optional
+
+router = APIRouter()
+
+# Procedure calls (APOC, db.*) can write or run unbounded work outside the read-only guard
+CALL_CLAUSE = re.compile(r'\bCALL\b', re.IGNORECASE)
+
+PK_EXPORT_COLUMNS = ['ADC_Name', 'Dosage', 'parameter', 'analyte', 'value', 'unit']
+AE_EXPORT_COLUMNS = ['ADC_Name', 'Dosage', 'event', 'grade', 'count', 'percent', 'related']
+
+
+def _check_format(format: str):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(EXPORT_FORMATS)}")
+
+
+def _streaming_response(chunks: Iterator[bytes], format: str, name: str) -> StreamingResponse:
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+    )
+
+
+def cohort_export_rows(table: str, query: str, params: Dict[str, Any], ae: Optional[str]) -> Iterator[Dict[str, Any]]:
+    """One flat row per PK value or AE of each cohort, normalised like the dashboard table."""
+    for row in normalize_cohorts(neo4j_client.stream_read(query, params, timeout=settings.EXPORT_QUERY_TIMEOUT)):
+        if table == "pk":
+            for pk in row.PK_Parameters:
+                yield {"ADC_Name": row.ADC_Name, "Dosage": row.Dosage, "parameter": pk.parameter,
+                       "analyte": pk.analyte, "value": pk.value, "unit": pk.unit}
+        else:
+            for event in row.Adverse_Events:
+                if ae is None or event.event == ae:
+                    yield {"ADC_Name": row.ADC_Name, "Dosage": row.Dosage, "event": event.event,
+                           "grade": event.grade, "count": event.count, "percent": event.percent,
+                           "related": event.related}
+
+
+@router.get("/export/cohorts")
+async def export_cohorts(
+    table: str = "pk",
+    format: str = "csv",
+    adc: Optional[str] = None,
+    ae: Optional[str] = None,
+    pk: Optional[str] = None,
+):
+    """Stream the cohort PK or AE table, filtered in Cypher, without materialising it."""
+    _check_format(format)
+    if table not in ("pk", "ae"):
+        raise HTTPException(status_code=400, detail="table must be pk or ae")
+    try:
+        conditions, params = cohort_filters(adc, ae, pk)
+        query = build_rollup_query(
+            where=where_clause(conditions),
+            parameters=[pk] if pk and table == "pk" else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Fail fast with 503 rather than break the stream once it has started
+    neo4j_breaker.check()
+    columns = PK_EXPORT_COLUMNS if table == "pk" else AE_EXPORT_COLUMNS
+    rows = cohort_export_rows(table, query, params, ae)
+    # Stored PK / AE values mix numbers and text, so every column is typed as text
+    return _streaming_response(stream_export(rows, format, columns, text_columns=columns), format, f"cohorts-{table}")
+
+
+@router.post("/export/query")
+async def export_query(export: ExportQuery, x_export_token: Optional[str] = Header(None)):
+    """Stream the result of a read-only Cypher query; needs X-Export-Token: <EXPORT_TOKEN>."""
+    if not settings.EXPORT_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_export_token != settings.EXPORT_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid export token")
+    _check_format(export.format)
+    if WRITE_CLAUSES.search(export.query):
+        raise HTTPException(status_code=400, detail="Only read queries can be exported")
+    if CALL_CLAUSE.search(export.query):
+        raise HTTPException(status_code=400, detail="Procedure calls cannot be exported")
+    try:
+        # Fail on syntax errors before the response starts streaming
+        await run_in_threadpool(explain_warnings, export.query)
+    except Overloaded:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid query: {str(e)}")
+
+    rows = plain_records(neo4j_client.stream_read(
+        export.query, export.parameters, timeout=settings.EXPORT_QUERY_TIMEOUT
+    ))
+    return _streaming_response(stream_export(rows, export.format), export.format, "query")
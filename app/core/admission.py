@@ -0,0 +1,183 @@
+"""
+Admission control: bounded concurrency, bounded priority wait queues and load shedding.
+
+Each AdmissionPool admits up to `limit` holders at once. Up to `queue_size` more
+callers wait, and the lowest priority number is served first. A caller that
+finds the queue full, or waits longer than `timeout`, gets Overloaded. The HTTP
+layer turns that into 503 with Retry-After, so gunicorn never has to kill a
+worker over a pile-up.
+
+Pools (per worker process):
+    requests - every HTTP request, via AdmissionMiddleware; cheap reads have priority
+    llm      - each Gemini call made on a cache miss
+    render   - each plot / page render made on a cache miss
+"""
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+# Lower numbers are admitted first when requests queue
+PRIORITY_READ = 0
+PRIORITY_RENDER = 1
+PRIORITY_LLM = 2
+PRIORITY_BULK = 3
+
+ENDPOINT_PRIORITIES = {
+    "/ask": PRIORITY_LLM,
+    "/update-plot": PRIORITY_RENDER,
+    "/visualize": PRIORITY_RENDER,
+    "/export/cohorts": PRIORITY_BULK,
+    "/export/query": PRIORITY_BULK,
+}
+EXEMPT_PREFIXES = ("/static",)
+
+
+class Overloaded(Exception):
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"{pool} is at capacity")
+        self.pool = pool
+        self.retry_after = retry_after
+        self.detail = f"Server busy ({pool}), please retry shortly"
+
+
+class AdmissionPool:
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float, retry_after: int = 5):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+
+    async def acquire(self, priority: int = 0):
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            self.admitted += 1
+            return
+        if self.waiting >= self.queue_size:
+            self.rejected += 1
+            raise Overloaded(self.name, self.retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._sequence), future])
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                future.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise Overloaded(self.name, self.retry_after)
+        finally:
+            self.waiting -= 1
+        self.admitted += 1
+
+    def release(self):
+        # Hand the slot straight to the best waiter that is still waiting
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def saturated(self) -> bool:
+        """True when a new caller would have to queue."""
+        return self.active >= self.limit
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "pool": self.name,
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+request_pool = AdmissionPool(
+    "requests", settings.ADMISSION_MAX_REQUESTS, settings.ADMISSION_QUEUE_SIZE,
+    settings.ADMISSION_QUEUE_TIMEOUT, retry_after=1,
+)
+llm_pool = AdmissionPool(
+    "llm", settings.LLM_CONCURRENCY, settings.LLM_QUEUE_SIZE,
+    settings.LLM_QUEUE_TIMEOUT, retry_after=10,
+)
+render_pool = AdmissionPool(
+    "render", settings.RENDER_CONCURRENCY, settings.RENDER_QUEUE_SIZE,
+    settings.RENDER_QUEUE_TIMEOUT, retry_after=3,
+)
+
+
+async def run_limited(pool: AdmissionPool, fn: Callable, *args, priority: int = 0) -> Any:
+    """Run blocking fn(*args) in the threadpool while holding a slot in pool."""
+    async with pool.slot(priority):
+        return await run_in_threadpool(fn, *args)
+
+
+def overloaded_response(error: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        {"detail": error.detail},
+        status_code=503,
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware that admits each HTTP request through a pool, by endpoint priority."""
+
+    def __init__(self, app, pool: AdmissionPool = None, priorities: Dict[str, int] = None):
+        self.app = app
+        self.pool = pool or request_pool
+        self.priorities = ENDPOINT_PRIORITIES if priorities is None else priorities
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.pool.acquire(self.priorities.get(scope["path"], PRIORITY_READ))
+        except Overloaded as e:
+            await overloaded_response(e)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.pool.release()
+
+
+async def _overloaded_handler(request, error: Overloaded) -> JSONResponse:
+    return overloaded_response(error)
+
+
+def add_admission_control(app: FastAPI):
+    """Shed load with 503 + Retry-After instead of letting requests pile up."""
+    app.add_middleware(AdmissionMiddleware)
+    app.add_exception_handler(Overloaded, _overloaded_handler)
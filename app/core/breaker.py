@@ -0,0 +1,288 @@
+"""
+Circuit breakers for the Neo4j driver and the Gemini model.
+
+Each breaker counts consecutive dependency failures. After failure_threshold of
+them it opens: calls fail at once with CircuitOpen (a 503 with Retry-After at
+the HTTP layer) instead of each waiting out a connection or LLM timeout. After
+reset_timeout one probe call is let through (half-open); success closes the
+breaker, failure opens it again. Calls slower than slow_call_seconds count as
+failures, so a dependency that is up but unusably slow also trips it.
+
+resources.driver and resources.model hand out guarded wrappers, so every call
+site goes through a breaker without changes. Neo4j results are lazy: records
+arrive while the caller iterates, after run() has returned. Guarded sessions
+and transactions therefore hand back guarded results, so a connection lost
+mid-stream is still counted.
+"""
+import math
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from app.core.admission import Overloaded
+from app.core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Overloaded):
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(name, retry_after)
+        self.detail = f"{name} is temporarily unavailable, please retry shortly"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        slow_call_seconds: float = 0,
+        is_failure: Callable[[BaseException], bool] = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.is_failure = is_failure or (lambda error: True)
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started: Optional[float] = None
+        self.calls = 0
+        self.failed_calls = 0
+        self.rejected = 0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def _retry_after(self, now: float) -> int:
+        return max(1, math.ceil(self.opened_at + self.reset_timeout - now))
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go ahead now."""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                if now - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name, self._retry_after(now))
+                self.state = HALF_OPEN
+                self.probe_started = None
+            if self.state == HALF_OPEN:
+                # One probe at a time; a probe that never returned is replaced after reset_timeout
+                if self.probe_started is not None and now - self.probe_started < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name, max(1, math.ceil(self.reset_timeout)))
+                self.probe_started = now
+            self.calls += 1
+
+    def on_success(self, duration: float = 0.0):
+        if self.slow_call_seconds and duration > self.slow_call_seconds:
+            self.on_failure()
+            return
+        with self._lock:
+            self.failures = 0
+            self.state = CLOSED
+            self.probe_started = None
+
+    def on_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.failed_calls += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probe_started = None
+
+    def on_error(self, error: BaseException):
+        """Count error against the dependency if it is a failure, e.g. one raised after the call returned."""
+        if self.is_failure(error):
+            self.on_failure()
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        self.before_call()
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self.on_failure()
+            else:
+                # The dependency answered; the request itself was bad
+                self.on_success()
+            raise
+        self.on_success(time.monotonic() - started)
+        return result
+
+    def check(self):
+        """Fail fast if the breaker is open, e.g. before starting a streaming response."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpen(self.name, self._retry_after(time.monotonic()))
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.name,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "calls": self.calls,
+            "failed_calls": self.failed_calls,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
+
+
+def _neo4j_unavailable(error: BaseException) -> bool:
+    """Connectivity failures trip the breaker; Cypher errors mean the server is up."""
+    try:
+        from neo4j.exceptions import ServiceUnavailable, SessionExpired
+    except ImportError:
+        return True
+    return isinstance(error, (ServiceUnavailable, SessionExpired, OSError, TimeoutError))
+
+
+def _llm_unavailable(error: BaseException) -> bool:
+    """Server errors, timeouts and rate limits trip the breaker; other 4xx do not."""
+    try:
+        from google.api_core.exceptions import ClientError, TooManyRequests
+    except ImportError:
+        return True
+    return not isinstance(error, ClientError) or isinstance(error, TooManyRequests)
+
+
+def _reported(breaker: CircuitBreaker, fn: Callable, *args, **kwargs) -> Any:
+    """fn(*args, **kwargs) for work that continues a call already let through; its failures count."""
+    try:
+        return fn(*args, **kwargs)
+    except StopIteration:
+        raise
+    except Exception as e:
+        breaker.on_error(e)
+        raise
+
+
+class GuardedResult:
+    """Neo4j result whose iteration and fetch methods (single, consume, data, ...)
+    report failures to the breaker."""
+
+    def __init__(self, result, breaker: CircuitBreaker):
+        self._result = result
+        self._breaker = breaker
+        self._iterator = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = iter(self._result)
+        return _reported(self._breaker, next, self._iterator)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._result, name)
+        if not callable(attribute):
+            return attribute
+        return lambda *args, **kwargs: _reported(self._breaker, attribute, *args, **kwargs)
+
+
+class GuardedTransaction:
+    """Neo4j explicit transaction whose run goes through the breaker and returns a guarded result."""
+
+    def __init__(self, transaction, breaker: CircuitBreaker):
+        self._transaction = transaction
+        self._breaker = breaker
+
+    def __enter__(self):
+        self._transaction.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is not None:
+            # The error that ended the block has already been counted
+            return self._transaction.__exit__(*exc)
+        # Leaving the block commits, which talks to the server
+        return _reported(self._breaker, self._transaction.__exit__, *exc)
+
+    def run(self, query, *args, **kwargs) -> GuardedResult:
+        return GuardedResult(self._breaker.call(self._transaction.run, query, *args, **kwargs), self._breaker)
+
+    def commit(self):
+        return _reported(self._breaker, self._transaction.commit)
+
+    def __getattr__(self, name):
+        return getattr(self._transaction, name)
+
+
+class GuardedSession:
+    """Neo4j session whose run / begin_transaction / execute_read / execute_write go through the breaker."""
+
+    def __init__(self, session, breaker: CircuitBreaker):
+        self._session = session
+        self._breaker = breaker
+
+    def __enter__(self):
+        self._session.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._session.__exit__(*exc)
+
+    def run(self, query, *args, **kwargs) -> GuardedResult:
+        return GuardedResult(self._breaker.call(self._session.run, query, *args, **kwargs), self._breaker)
+
+    def begin_transaction(self, *args, **kwargs) -> GuardedTransaction:
+        return GuardedTransaction(self._breaker.call(self._session.begin_transaction, *args, **kwargs), self._breaker)
+
+    def execute_read(self, transaction_function: Callable, *args, **kwargs) -> Any:
+        # Results are consumed inside transaction_function, so its failures surface here
+        return self._breaker.call(self._session.execute_read, transaction_function, *args, **kwargs)
+
+    def execute_write(self, transaction_function: Callable, *args, **kwargs) -> Any:
+        return self._breaker.call(self._session.execute_write, transaction_function, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class GuardedDriver:
+    def __init__(self, driver, breaker: CircuitBreaker):
+        self._driver = driver
+        self._breaker = breaker
+
+    def session(self, **kwargs) -> GuardedSession:
+        self._breaker.check()
+        return GuardedSession(self._driver.session(**kwargs), self._breaker)
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+
+class GuardedModel:
+    def __init__(self, model, breaker: CircuitBreaker):
+        self._model = model
+        self._breaker = breaker
+
+    def generate_content(self, *args, **kwargs):
+        return self._breaker.call(self._model.generate_content, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+neo4j_breaker = CircuitBreaker(
+    "neo4j", settings.BREAKER_FAILURES, settings.BREAKER_RESET_SECONDS,
+    is_failure=_neo4j_unavailable,
+)
+llm_breaker = CircuitBreaker(
+    "llm", settings.BREAKER_FAILURES, settings.BREAKER_RESET_SECONDS,
+    slow_call_seconds=settings.LLM_SLOW_CALL_SECONDS, is_failure=_llm_unavailable,
+)
@@ -0,0 +1,367 @@
+"""
+Pluggable cache backends shared by every data-derived cache in the app.
+
+Tiers:
+    MemoryCache  - per-process LRU
+    SQLiteCache  - one file shared by all workers on the host
+    RedisCache   - optional, shared across hosts (any Redis-protocol server)
+
+TieredCache reads tiers in order and back-fills the faster ones on a hit. Every
+entry records the dataset version it was built against and is treated as a miss
+once the version moves on; on a version change the local tiers also drop their
+stale entries. Values are pickled for the shared tiers.
+
+get_or_compute reads and writes the in-process memory tier inline and the
+SQLite / Redis tiers in the threadpool, so their I/O never blocks the event loop.
+"""
+import asyncio
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.data_version import current_version, data_version
+from app.core.paths import private_file
+from app.core.singleflight import singleflight
+
+_MISSING = object()
+
+
+def _key_str(key: Hashable) -> str:
+    return key if isinstance(key, str) else repr(key)
+
+
+class CacheBackend:
+    """Interface implemented by every tier."""
+
+    name = "backend"
+    # get / set do file or network I/O, so async callers run them in the threadpool
+    blocking = True
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, key: str):
+        """Return (version, expires, value) or None."""
+        raise NotImplementedError
+
+    def _store(self, key: str, version: int, expires: float, value: Any):
+        raise NotImplementedError
+
+    def delete(self, key: Hashable):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def invalidate(self, version: int):
+        """Drop entries built against any other version. Optional for a tier."""
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._load(_key_str(key))
+        if entry is not None:
+            version, expires, value = entry
+            if version == current_version() and expires > time.time():
+                self.hits += 1
+                return value
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> Any:
+        self._store(_key_str(key), current_version(), time.time() + (ttl or self.ttl), value)
+        return value
+
+    async def aget(self, key: Hashable, default: Any = None) -> Any:
+        if self.blocking:
+            return await run_in_threadpool(self.get, key, default)
+        return self.get(key, default)
+
+    async def aset(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> Any:
+        if self.blocking:
+            return await run_in_threadpool(self.set, key, value, ttl)
+        return self.set(key, value, ttl)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class MemoryCache(CacheBackend):
+    name = "memory"
+    blocking = False
+
+    def __init__(self, max_entries: int = 512, ttl: float = 3600.0):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key: str, version: int, expires: float, value: Any):
+        with self._lock:
+            self._entries[key] = (version, expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(_key_str(key), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, version: int):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[0] != version]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        return {**super().stats(), "entries": len(self._entries)}
+
+
+class SQLiteCache(CacheBackend):
+    """Cache in a local SQLite file (WAL mode) so all gunicorn workers share entries."""
+
+    name = "sqlite"
+    PURGE_EVERY = 200
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 3600.0):
+        super().__init__(ttl)
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        # Entries are unpickled, so the file must not be writable by anyone else
+        private_file(path)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, version INTEGER, expires REAL, value BLOB)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads or across a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _load(self, key: str):
+        row = self._connection().execute(
+            "SELECT version, expires, value FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], pickle.loads(row[2])
+
+    def _store(self, key: str, version: int, expires: float, value: Any):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, version, expires, value) VALUES (?, ?, ?, ?)",
+            (key, version, expires, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge()
+
+    def purge(self):
+        """Drop expired entries and trim to max_entries, soonest-expiring first."""
+        conn = self._connection()
+        conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN ("
+            "SELECT key FROM cache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def delete(self, key: Hashable):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (_key_str(key),))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def invalidate(self, version: int):
+        self._connection().execute("DELETE FROM cache WHERE version != ?", (version,))
+
+    def stats(self) -> dict:
+        conn = self._connection()
+        entries = conn.execute("SELECT count(*) FROM cache").fetchone()[0]
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {**super().stats(), "entries": entries, "bytes": size}
+
+
+class RedisCache(CacheBackend):
+    """Cache on a Redis-protocol server. Pass client to use a stand-in such as fakeredis."""
+
+    name = "redis"
+
+    def __init__(self, url: str = "", ttl: float = 3600.0, prefix: str = "vantage:", client=None):
+        super().__init__(ttl)
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("CACHE_TIERS includes redis but the redis package is not installed")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _load(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def _store(self, key: str, version: int, expires: float, value: Any):
+        payload = pickle.dumps((version, expires, value), protocol=pickle.HIGHEST_PROTOCOL)
+        self.client.set(self.prefix + key, payload, ex=max(1, int(expires - time.time())))
+
+    def delete(self, key: Hashable):
+        self.client.delete(self.prefix + _key_str(key))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    # invalidate() is left to the version check and the key TTL: scanning a shared
+    # server on every version change would cost more than the stale keys do
+
+
+class TieredCache(CacheBackend):
+    name = "tiered"
+
+    def __init__(self, tiers: List[CacheBackend]):
+        super().__init__(max(tier.ttl for tier in tiers))
+        self.tiers = tiers
+        self.blocking = any(tier.blocking for tier in tiers)
+        # Leading tiers that do no I/O; async callers use them inline
+        self._inline = 0
+        while self._inline < len(tiers) and not tiers[self._inline].blocking:
+            self._inline += 1
+
+    def _lookup(self, key: Hashable, start: int, stop: int) -> Any:
+        """Value from tiers[start:stop], back-filling the faster tiers, or _MISSING."""
+        for index in range(start, stop):
+            value = self.tiers[index].get(key, _MISSING)
+            if value is not _MISSING:
+                for faster in self.tiers[:index]:
+                    faster.set(key, value)
+                return value
+        return _MISSING
+
+    def _counted(self, value: Any, default: Any) -> Any:
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self._counted(self._lookup(key, 0, len(self.tiers)), default)
+
+    async def aget(self, key: Hashable, default: Any = None) -> Any:
+        value = self._lookup(key, 0, self._inline)
+        if value is _MISSING and self._inline < len(self.tiers):
+            value = await run_in_threadpool(self._lookup, key, self._inline, len(self.tiers))
+        return self._counted(value, default)
+
+    def _set_tiers(self, tiers: List[CacheBackend], key: Hashable, value: Any, ttl: Optional[float]):
+        for tier in tiers:
+            tier.set(key, value, ttl)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> Any:
+        self._set_tiers(self.tiers, key, value, ttl)
+        return value
+
+    async def aset(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> Any:
+        self._set_tiers(self.tiers[:self._inline], key, value, ttl)
+        if self._inline < len(self.tiers):
+            await run_in_threadpool(self._set_tiers, self.tiers[self._inline:], key, value, ttl)
+        return value
+
+    def delete(self, key: Hashable):
+        for tier in self.tiers:
+            tier.delete(key)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def invalidate(self, version: int):
+        for tier in self.tiers:
+            tier.invalidate(version)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "tiers": [tier.stats() for tier in self.tiers]}
+
+
+def build_cache(tiers: str = None) -> CacheBackend:
+    """Build the cache described by a comma-separated tier list, e.g. "memory,sqlite"."""
+    backends = []
+    for tier in (tiers or settings.CACHE_TIERS).split(","):
+        tier = tier.strip()
+        if tier == "memory":
+            backends.append(MemoryCache(settings.CACHE_MEMORY_ENTRIES, settings.CACHE_TTL))
+        elif tier == "sqlite":
+            backends.append(SQLiteCache(settings.CACHE_SQLITE_PATH, ttl=settings.CACHE_TTL))
+        elif tier == "redis":
+            backends.append(RedisCache(settings.CACHE_REDIS_URL, settings.CACHE_TTL))
+        elif tier:
+            raise ValueError(f"Unknown cache tier: {tier}")
+    return backends[0] if len(backends) == 1 else TieredCache(backends)
+
+
+cache = build_cache()
+data_version.subscribe(cache.invalidate)
+
+
+async def get_or_compute(
+    key: Hashable,
+    fn: Callable,
+    *args,
+    ttl: Optional[float] = None,
+    cache_if: Callable[[Any], bool] = None,
+) -> Any:
+    """Return the cached value for key, or compute it once (single-flight) and cache it.
+
+    cache_if can reject values that must not be cached, such as error responses.
+    """
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    async def compute():
+        if asyncio.iscoroutinefunction(fn):
+            result = await fn(*args)
+        else:
+            result = await run_in_threadpool(fn, *args)
+        if cache_if is None or cache_if(result):
+            await cache.aset(key, result, ttl)
+        return result
+
+    return await singleflight.do(key, compute)
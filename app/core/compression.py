@@ -0,0 +1,13 @@
+from fastapi import FastAPI
+from starlette.middleware.gzip import GZipMiddleware
+
+
+def add_compression(app: FastAPI, minimum_size: int = 1000):
+    """Compress responses with brotli when brotli-asgi is installed, otherwise gzip."""
+    try:
+        from brotli_asgi import BrotliMiddleware
+    except ImportError:
+        app.add_middleware(GZipMiddleware, minimum_size=minimum_size)
+    else:
+        # Falls back to gzip for clients that do not accept br
+        app.add_middleware(BrotliMiddleware, minimum_size=minimum_size)
@@ -4,10 +4,66 @@ import os
 
 load_dotenv()
 
+# Private per-user directory for caches and learned state (see app.core.paths)
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "vantage"
+))
+
 class Settings(BaseSettings):
     NEO4J_URI: str = os.getenv("NEO4J_URI", "")
     NEO4J_USER: str = os.getenv("NEO4J_USER", "")
     NEO4J_PASSWORD: str = os.getenv("NEO4J_PASSWORD", "")
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    DATA_DIR: str = DATA_DIR
+    TEMPLATE_CACHE_DIR: str = os.getenv("TEMPLATE_CACHE_DIR", os.path.join(DATA_DIR, "jinja"))
+    TEMPLATE_AUTO_RELOAD: bool = os.getenv("TEMPLATE_AUTO_RELOAD", "false").lower() == "true"
+    CACHE_TIERS: str = os.getenv("CACHE_TIERS", "memory,sqlite")
+    CACHE_TTL: float = float(os.getenv("CACHE_TTL", "86400"))
+    CACHE_MEMORY_ENTRIES: int = int(os.getenv("CACHE_MEMORY_ENTRIES", "512"))
+    CACHE_SQLITE_PATH: str = os.getenv("CACHE_SQLITE_PATH", os.path.join(DATA_DIR, "cache.sqlite3"))
+    CACHE_REDIS_URL: str = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+    DATA_VERSION_POLL_SECONDS: float = float(os.getenv("DATA_VERSION_POLL_SECONDS", "30"))
+    DATA_VERSION_MODE: str = os.getenv("DATA_VERSION_MODE", "watermark")
+    ADMISSION_MAX_REQUESTS: int = int(os.getenv("ADMISSION_MAX_REQUESTS", "64"))
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", "128"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+    LLM_CONCURRENCY: int = int(os.getenv("LLM_CONCURRENCY", "4"))
+    LLM_QUEUE_SIZE: int = int(os.getenv("LLM_QUEUE_SIZE", "16"))
+    LLM_QUEUE_TIMEOUT: float = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+    RENDER_CONCURRENCY: int = int(os.getenv("RENDER_CONCURRENCY", "2"))
+    RENDER_QUEUE_SIZE: int = int(os.getenv("RENDER_QUEUE_SIZE", "16"))
+    RENDER_QUEUE_TIMEOUT: float = float(os.getenv("RENDER_QUEUE_TIMEOUT", "10"))
+    MEMORY_LIMIT_MB: float = float(os.getenv("MEMORY_LIMIT_MB", "0"))
+    MEMORY_CHECK_SECONDS: float = float(os.getenv("MEMORY_CHECK_SECONDS", "15"))
+    MEMORY_RECYCLE: bool = os.getenv("MEMORY_RECYCLE", "false").lower() == "true"
+    FEWSHOT_K: int = int(os.getenv("FEWSHOT_K", "4"))
+    FEWSHOT_STORE_PATH: str = os.getenv("FEWSHOT_STORE_PATH", os.path.join(DATA_DIR, "fewshot.jsonl"))
+    FEWSHOT_MAX_LEARNED: int = int(os.getenv("FEWSHOT_MAX_LEARNED", "500"))
+    FEWSHOT_MAX_LEARNED_IN_PROMPT: int = int(os.getenv("FEWSHOT_MAX_LEARNED_IN_PROMPT", "1"))
+    CYPHER_REPAIR_ATTEMPTS: int = int(os.getenv("CYPHER_REPAIR_ATTEMPTS", "2"))
+    CYPHER_REPAIR_DEADLINE: float = float(os.getenv("CYPHER_REPAIR_DEADLINE", "20"))
+    CYPHER_REPAIR_EMPTY_TTL: float = float(os.getenv("CYPHER_REPAIR_EMPTY_TTL", "3600"))
+    SNAPSHOT_DIR: str = os.getenv("SNAPSHOT_DIR", "")
+    SNAPSHOT_KEEP: int = int(os.getenv("SNAPSHOT_KEEP", "2"))
+    NEO4J_CONNECT_TIMEOUT: float = float(os.getenv("NEO4J_CONNECT_TIMEOUT", "5"))
+    NEO4J_ACQUIRE_TIMEOUT: float = float(os.getenv("NEO4J_ACQUIRE_TIMEOUT", "10"))
+    NEO4J_RETRY_TIME: float = float(os.getenv("NEO4J_RETRY_TIME", "5"))
+    BREAKER_FAILURES: int = int(os.getenv("BREAKER_FAILURES", "5"))
+    BREAKER_RESET_SECONDS: float = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+    LLM_SLOW_CALL_SECONDS: float = float(os.getenv("LLM_SLOW_CALL_SECONDS", "30"))
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_MAX_CHARS: int = int(os.getenv("LOG_MAX_CHARS", "1000"))
+    LOG_MAX_KEYS: int = int(os.getenv("LOG_MAX_KEYS", "20"))
+    LOG_SAMPLE_ITEMS: int = int(os.getenv("LOG_SAMPLE_ITEMS", "3"))
+    EXPORT_TOKEN: str = os.getenv("EXPORT_TOKEN", "")
+    EXPORT_QUERY_TIMEOUT: float = float(os.getenv("EXPORT_QUERY_TIMEOUT", "60"))
+    PROFILE_TOKEN: str = os.getenv("PROFILE_TOKEN", "")
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+    PROFILE_KEEP: int = int(os.getenv("PROFILE_KEEP", "20"))
+    DEBUG_ENDPOINTS: bool = os.getenv("DEBUG_ENDPOINTS", "false").lower() == "true"
 
 settings = Settings() 
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+Dataset version used to key caches of data-derived output.
+
+Any cache entry built from graph data stores the version it was built against and
+is ignored once the version moves on.
+
+The version is derived from a watermark read from the graph: the newest
+createdAt and the counts of PK_Observation, DosageCohort and HAS_AE, or in
+"counter" mode just a (:DataVersion {id: 'graph'}) node that writers increment.
+The counts come from Neo4j's count store, and the newest createdAt is read off
+a range index in descending order, so a poll never scans the graph. The app
+does not change the schema itself: create the indexes once per database with
+
+    python -m app.core.data_version create-indexes
+
+Without them the watermark query still works, only slower; the first poll of
+each worker logs which indexes are missing.
+Every worker polls the same graph, so all of them arrive at the same version and
+entries in the shared cache tiers stay valid across workers. Subscribers (the
+caches) are told when the version changes so they can drop stale entries.
+"""
+import argparse
+import asyncio
+import hashlib
+import threading
+from typing import Any, Callable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.log import get_logger
+
+log = get_logger(__name__)
+
+# createdAt is read as ORDER BY ... DESC LIMIT 1 so the planner walks the
+# range index backwards; max() would scan every node. collect() keeps one row
+# per subquery when a label has no nodes yet.
+WATERMARK_QUERY = """
+CALL { MATCH (pk:PK_Observation) WHERE pk.createdAt IS NOT NULL
+       WITH pk.createdAt AS created ORDER BY created DESC LIMIT 1 RETURN collect(created) AS pk_created }
+CALL { MATCH (pk:PK_Observation) RETURN count(pk) AS pk_count }
+CALL { MATCH (cohort:DosageCohort) WHERE cohort.createdAt IS NOT NULL
+       WITH cohort.createdAt AS created ORDER BY created DESC LIMIT 1 RETURN collect(created) AS cohort_created }
+CALL { MATCH (cohort:DosageCohort) RETURN count(cohort) AS cohort_count }
+CALL { MATCH ()-[ae:HAS_AE]->() WHERE ae.createdAt IS NOT NULL
+       WITH ae.createdAt AS created ORDER BY created DESC LIMIT 1 RETURN collect(created) AS ae_created }
+CALL { MATCH ()-[ae:HAS_AE]->() RETURN count(ae) AS ae_count }
+CALL { OPTIONAL MATCH (v:DataVersion {id: 'graph'}) RETURN v.version AS counter }
+RETURN toString(head(pk_created)) AS pk_created, pk_count,
+       toString(head(cohort_created)) AS cohort_created, cohort_count,
+       toString(head(ae_created)) AS ae_created, ae_count,
+       counter
+"""
+
+# Index name -> statement creating it
+WATERMARK_INDEXES = {
+    "pk_created_at": "CREATE INDEX pk_created_at IF NOT EXISTS FOR (n:PK_Observation) ON (n.createdAt)",
+    "cohort_created_at": "CREATE INDEX cohort_created_at IF NOT EXISTS FOR (n:DosageCohort) ON (n.createdAt)",
+    "has_ae_created_at": "CREATE INDEX has_ae_created_at IF NOT EXISTS FOR ()-[r:HAS_AE]-() ON (r.createdAt)",
+}
+
+INDEX_NAMES_QUERY = """
+SHOW INDEXES YIELD name
+WHERE name IN $names
+RETURN collect(name) AS names
+"""
+
+COUNTER_QUERY = """
+OPTIONAL MATCH (v:DataVersion {id: 'graph'})
+RETURN v.version AS counter
+"""
+
+# Run by anything that writes to the graph
+BUMP_COUNTER_QUERY = """
+MERGE (v:DataVersion {id: 'graph'})
+SET v.version = coalesce(v.version, 0) + 1, v.updatedAt = datetime()
+RETURN v.version AS counter
+"""
+
+_lock = threading.Lock()
+_version = 0
+
+
+def current_version() -> int:
+    return _version
+
+
+def set_version(version: int) -> int:
+    global _version
+    with _lock:
+        _version = version
+    return version
+
+
+def bump_version() -> int:
+    """Mark all data-derived caches as stale."""
+    global _version
+    with _lock:
+        _version += 1
+        version = _version
+    data_version.publish(version)
+    return version
+
+
+def version_for(watermark: Tuple) -> int:
+    """Stable integer version for a watermark, identical in every process."""
+    digest = hashlib.sha1(repr(watermark).encode("utf-8")).hexdigest()
+    return int(digest[:15], 16)
+
+
+class DataVersionService:
+    """Polls the graph watermark and publishes version changes to subscribers."""
+
+    def __init__(self, poll_interval: float = 30.0, mode: str = "watermark"):
+        self.poll_interval = poll_interval
+        self.mode = mode
+        self.watermark: Optional[Tuple] = None
+        self.indexes_checked = False
+        self._subscribers: List[Callable[[int], Any]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, callback: Callable[[int], Any]):
+        """callback(version) is called after every version change."""
+        self._subscribers.append(callback)
+
+    def publish(self, version: int):
+        for callback in self._subscribers:
+            try:
+                callback(version)
+            except Exception:
+                log.exception("data_version_subscriber_failed")
+
+    def fetch_watermark(self) -> Tuple:
+        # Imported here: resources imports this module for its lifespan
+        from app.core.resources import resources
+
+        query = COUNTER_QUERY if self.mode == "counter" else WATERMARK_QUERY
+        with resources.driver.session() as session:
+            record = session.run(query).single()
+        return tuple(record.values()) if record else ()
+
+    def check_indexes(self):
+        """Log the watermark indexes that are missing, once per process."""
+        from app.core.resources import resources
+
+        if self.indexes_checked or self.mode == "counter":
+            return
+        try:
+            with resources.driver.session() as session:
+                record = session.run(INDEX_NAMES_QUERY, names=list(WATERMARK_INDEXES)).single()
+            missing = sorted(set(WATERMARK_INDEXES) - set(record["names"] if record else []))
+        except Exception as e:
+            # SHOW INDEXES may not be permitted; the watermark query runs either way
+            log.debug("watermark_index_check_failed", error=e)
+            missing = []
+        if missing:
+            log.warning("watermark_indexes_missing", missing=missing,
+                        fix="python -m app.core.data_version create-indexes")
+        self.indexes_checked = True
+
+    def poll(self) -> bool:
+        """Read the watermark; returns True if the version changed."""
+        watermark = self.fetch_watermark()
+        self.check_indexes()
+        if watermark == self.watermark:
+            return False
+        self.watermark = watermark
+        self.publish(set_version(version_for(watermark)))
+        return True
+
+    async def _run(self):
+        from starlette.concurrency import run_in_threadpool
+
+        while True:
+            try:
+                await run_in_threadpool(self.poll)
+            except Exception as e:
+                log.warning("data_version_poll_failed", error=e)
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        """Start polling in the background; call from the running event loop."""
+        if self.poll_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+data_version = DataVersionService(settings.DATA_VERSION_POLL_SECONDS, settings.DATA_VERSION_MODE)
+
+
+def create_indexes(driver) -> List[str]:
+    """Create the watermark indexes; returns their names."""
+    with driver.session() as session:
+        for statement in WATERMARK_INDEXES.values():
+            session.run(statement).consume()
+    return list(WATERMARK_INDEXES)
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Manage the graph watermark used as the data version")
+    parser.add_argument("command", choices=["create-indexes"])
+    parser.parse_args(argv)
+
+    from app.core.resources import resources
+
+    print(f"Created or found indexes: {', '.join(create_indexes(resources.driver))}")
+    resources.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Structured JSON logging off the request path.
+
+    log = get_logger(__name__)
+    log.info("cypher_generated", query=query)
+    log.exception("ask_failed")                  # at ERROR, with the traceback
+
+Each call becomes one JSON line on stdout with the time, level, logger, event,
+pid and the current request id, plus the given fields. Fields are summarised
+in the calling thread at a bounded cost before they are queued: strings are cut
+to LOG_MAX_CHARS, dicts to LOG_MAX_KEYS keys, and a list longer than
+LOG_SAMPLE_ITEMS is logged as its length plus a sample of its first items. A
+call below LOG_LEVEL returns before touching its fields, so logging a whole
+dataset at debug level costs nothing in production.
+
+Records go through a bounded queue to a listener thread that serialises and
+writes them. When the queue is full, records are dropped and counted rather
+than blocking a request. The listener is started lazily in each process, so it
+also works after a gunicorn fork.
+
+RequestLogMiddleware gives every HTTP request an id (X-Request-ID, taken from
+the request if present). It logs one access line per request, with the status,
+the duration and the timings of the stage graphs the request ran.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI
+
+from app.core.config import settings
+from app.core.stages import collect_timings
+
+ROOT_LOGGER = "vantage"
+MAX_DEPTH = 4
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text) - limit} more chars)"
+
+
+def summarize(value: Any, depth: int = 0) -> Any:
+    """A JSON-ready, size-bounded stand-in for value."""
+    limit = settings.LOG_MAX_CHARS
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return _truncate(value, limit)
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, BaseException):
+        return _truncate(f"{type(value).__name__}: {value}", limit)
+    if depth >= MAX_DEPTH:
+        return f"<{type(value).__name__}>"
+    if isinstance(value, dict):
+        keys = settings.LOG_MAX_KEYS
+        summary = {str(k): summarize(v, depth + 1) for k, v in islice(value.items(), keys)}
+        if len(value) > keys:
+            summary["..."] = f"{len(value) - keys} more keys"
+        return summary
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = settings.LOG_SAMPLE_ITEMS
+        sample = [summarize(v, depth + 1) for v in islice(value, items)]
+        if len(value) <= items:
+            return sample
+        return {"count": len(value), "sample": sample}
+    if hasattr(value, "__dict__"):
+        # Plain and pydantic objects alike keep their fields in __dict__
+        return {"type": type(value).__name__, **summarize(vars(value), depth + 1)}
+    return _truncate(repr(value), limit)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name[len(ROOT_LOGGER) + 1:] if record.name.startswith(ROOT_LOGGER + ".") else record.name,
+            "event": record.getMessage(),
+            "pid": record.process,
+        }
+        rid = getattr(record, "request_id", None)
+        if rid:
+            entry["request_id"] = rid
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that starts its listener per process and drops records when the queue is full."""
+
+    def __init__(self, queue_size: int):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._pid = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # A listener thread does not survive fork; start a fresh queue and thread here
+                self.queue = queue.Queue(self.queue_size)
+                output = logging.StreamHandler(sys.stdout)
+                output.setFormatter(JsonFormatter())
+                self._listener = logging.handlers.QueueListener(self.queue, output)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Fields are already summarised; only the traceback must be rendered before the frames go
+        if record.exc_info:
+            record.exc_text = _truncate(logging.Formatter().formatException(record.exc_info), 10 * settings.LOG_MAX_CHARS)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Write out everything queued so far and stop the listener."""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": self.queue.qsize(), "dropped": self.dropped}
+
+
+handler = AsyncQueueHandler(settings.LOG_QUEUE_SIZE)
+_root = logging.getLogger(ROOT_LOGGER)
+_root.addHandler(handler)
+_root.setLevel(settings.LOG_LEVEL.upper())
+_root.propagate = False
+atexit.register(handler.flush)
+
+
+class StructLogger:
+    """Logger whose calls take an event name and keyword fields."""
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    def _log(self, level: int, event: str, exc_info: bool = False, **fields):
+        if not self._logger.isEnabledFor(level):
+            return
+        self._logger.log(level, event, exc_info=exc_info, extra={
+            "fields": {name: summarize(value) for name, value in fields.items()},
+            "request_id": request_id.get(),
+        })
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields):
+        self._log(logging.ERROR, event, **fields)
+
+    def exception(self, event: str, **fields):
+        """ERROR with the current exception's traceback."""
+        self._log(logging.ERROR, event, exc_info=True, **fields)
+
+
+def get_logger(name: str) -> StructLogger:
+    return StructLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"))
+
+
+access_log = get_logger("access")
+
+
+class RequestLogMiddleware:
+    """Pure ASGI middleware: request ids, X-Request-ID, and one access line per request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/static"):
+            await self.app(scope, receive, send)
+            return
+
+        header = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")[:64]
+        rid = header or uuid.uuid4().hex[:16]
+        request_id.set(rid)
+        stages = collect_timings()
+        status = {}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", rid.encode())]
+            await send(message)
+
+        began = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            access_log.info(
+                "request",
+                method=scope["method"],
+                path=scope["path"],
+                status=status.get("code", 500),
+                duration_ms=round(1000 * (time.perf_counter() - began), 1),
+                stages=[
+                    {"graph": entry["graph"],
+                     "timings_ms": {stage: round(1000 * seconds, 1) for stage, seconds in entry["timings"].items()}}
+                    for entry in stages
+                ],
+            )
+
+
+def add_request_logging(app: FastAPI):
+    app.add_middleware(RequestLogMiddleware)
@@ -0,0 +1,179 @@
+"""
+Per-worker memory watchdog and on-demand tracemalloc snapshots.
+
+The watchdog samples this process's RSS every MEMORY_CHECK_SECONDS. Above
+MEMORY_LIMIT_MB it first tries to give memory back (gc, then the in-process
+cache tier). If RSS is still over the limit it marks the worker as draining and,
+when MEMORY_RECYCLE is on (gunicorn), sends itself SIGTERM. The worker then
+finishes its in-flight requests within graceful_timeout and the master forks a
+fresh one. Under a bare uvicorn there is no master to replace the worker, so it
+only reports.
+"""
+import asyncio
+import gc
+import os
+import signal
+import time
+import tracemalloc
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.log import get_logger
+
+log = get_logger(__name__)
+
+MB = 1024 * 1024
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is the peak, in KiB on Linux; the best we have without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryWatchdog:
+    def __init__(self, limit_mb: float = 0, interval: float = 15.0, recycle: bool = False):
+        self.limit_mb = limit_mb
+        self.interval = interval
+        self.recycle = recycle
+        self.rss = 0
+        self.peak = 0
+        self.samples = 0
+        self.reclaims = 0
+        self.draining = False
+        self.started = time.time()
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self) -> int:
+        self.rss = rss_bytes()
+        self.peak = max(self.peak, self.rss)
+        self.samples += 1
+        return self.rss
+
+    def over_limit(self) -> bool:
+        return self.limit_mb > 0 and self.rss > self.limit_mb * MB
+
+    def reclaim(self):
+        """Give memory back before resorting to a recycle."""
+        # Imported here: the cache is not needed unless we are over the limit
+        from app.core.cache import MemoryCache, TieredCache, cache
+
+        self.reclaims += 1
+        gc.collect()
+        tiers = cache.tiers if isinstance(cache, TieredCache) else [cache]
+        for tier in tiers:
+            if isinstance(tier, MemoryCache):
+                tier.clear()
+        gc.collect()
+
+    def check(self):
+        """One watchdog tick; returns True once the worker is draining."""
+        self.sample()
+        if self.draining or not self.over_limit():
+            return self.draining
+        self.reclaim()
+        self.sample()
+        if not self.over_limit():
+            return False
+
+        self.draining = True
+        log.warning("memory_limit_exceeded", rss_mb=round(self.rss / MB), limit_mb=self.limit_mb, recycle=self.recycle)
+        if self.recycle:
+            # Graceful: the server stops accepting, finishes in-flight requests and exits
+            os.kill(os.getpid(), signal.SIGTERM)
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                log.exception("memory_watchdog_failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start sampling in the background; call from the running event loop."""
+        if self.interval > 0 and self._task is None:
+            self.sample()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        from app.services.plot_templates import template_count
+
+        return {
+            "pid": os.getpid(),
+            "rss_mb": round(self.rss / MB, 1),
+            "peak_rss_mb": round(self.peak / MB, 1),
+            "limit_mb": self.limit_mb,
+            "samples": self.samples,
+            "reclaims": self.reclaims,
+            "draining": self.draining,
+            "uptime_seconds": round(time.time() - self.started),
+            "gc_counts": gc.get_count(),
+            "plot_templates": template_count(),
+            "tracemalloc": tracemalloc.is_tracing(),
+        }
+
+
+memory_watchdog = MemoryWatchdog(settings.MEMORY_LIMIT_MB, settings.MEMORY_CHECK_SECONDS, settings.MEMORY_RECYCLE)
+
+
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+def start_tracing(frames: int = 10):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracing():
+    global _last_snapshot
+    tracemalloc.stop()
+    _last_snapshot = None
+
+
+def _format(stats, limit: int) -> List[dict]:
+    top = []
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        top.append({
+            "location": f"{frame.filename}:{frame.lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "size_diff_kb": round(getattr(stat, "size_diff", 0) / 1024, 1),
+            "count": stat.count,
+        })
+    return top
+
+
+def take_snapshot(limit: int = 25, key_type: str = "lineno") -> dict:
+    """Top allocations now, and the growth since the previous snapshot."""
+    global _last_snapshot
+    if not tracemalloc.is_tracing():
+        start_tracing()
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ])
+    current, peak = tracemalloc.get_traced_memory()
+    result = {
+        "traced_mb": round(current / MB, 1),
+        "traced_peak_mb": round(peak / MB, 1),
+        "top": _format(snapshot.statistics(key_type), limit),
+        "growth": _format(snapshot.compare_to(_last_snapshot, key_type), limit) if _last_snapshot else [],
+    }
+    _last_snapshot = snapshot
+    return result
@@ -0,0 +1,32 @@
+"""
+Private on-disk locations for state the app loads back.
+
+The SQLite cache tier (pickle), Jinja bytecode (marshal), learned few-shot
+examples (put into prompts) and profiles are all trusted when read, so they
+must not live where another local user can create or replace them. By default
+they go under DATA_DIR (~/.cache/vantage), created with mode 0700.
+private_dir() refuses a directory that another user owns or can write to, such
+as /tmp itself.
+"""
+import os
+import stat
+
+
+def private_dir(path: str) -> str:
+    """Create path (mode 0700) if missing and check that only this user can write to it."""
+    path = os.path.abspath(path)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    owner_ok = not hasattr(os, "getuid") or info.st_uid == os.getuid()
+    if not owner_ok or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise RuntimeError(
+            f"{path} must be owned by this user and not writable by others; "
+            "point DATA_DIR (or the specific path setting) at a private directory"
+        )
+    return path
+
+
+def private_file(path: str) -> str:
+    """path, after checking that its directory is private (see private_dir)."""
+    private_dir(os.path.dirname(os.path.abspath(path)))
+    return path
@@ -0,0 +1,236 @@
+"""
+On-demand sampling profiles of slow requests.
+
+A request to a profiled endpoint (/ask, /visualize, /update-plot) is profiled
+when it carries `X-Profile: <PROFILE_TOKEN>`, or at random for a
+PROFILE_SAMPLE_RATE fraction of requests. A sampler thread snapshots every
+thread's Python stack each PROFILE_INTERVAL_MS while the handler runs, so both
+the event loop and the threadpool work it hands off (Neo4j, Gemini, rendering)
+show up. One profile runs at a time per worker; other requests run unprofiled.
+
+Each profile is written to PROFILE_DIR as a speedscope file (open it at
+https://www.speedscope.app) plus its metadata and the request's stage timings.
+The response carries X-Profile-Id. Profiles are listed and downloaded via
+/debug/profiles, in speedscope or collapsed-stack (flamegraph.pl) format.
+
+With no token and a zero sample rate the middleware is not installed at all.
+"""
+import glob
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.paths import private_dir
+from app.core.stages import collect_timings
+
+log = get_logger(__name__)
+
+PROFILED_PATHS = ("/ask", "/visualize", "/update-plot")
+PROFILE_HEADER = b"x-profile"
+
+# (function name, file, first line) from the outermost frame to the innermost
+Stack = Tuple[Tuple[str, str, int], ...]
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of all other threads on a background thread."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Dict[str, Counter] = {}
+        self.count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                thread = names.get(ident, str(ident))
+                self.samples.setdefault(thread, Counter())[tuple(reversed(stack))] += 1
+            self.count += 1
+
+    def to_speedscope(self, name: str) -> Dict[str, Any]:
+        """Speedscope file with one sampled profile per thread."""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[Tuple[str, str, int], int] = {}
+        profiles = []
+        for thread, stacks in sorted(self.samples.items()):
+            samples, weights = [], []
+            for stack, count in stacks.items():
+                for frame in stack:
+                    if frame not in index:
+                        index[frame] = len(frames)
+                        frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                samples.append([index[frame] for frame in stack])
+                weights.append(count * self.interval)
+            profiles.append({
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "vantage-profiler",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def to_collapsed(self) -> str:
+        """Collapsed stacks, `thread;outer;...;inner count` per line, for flamegraph.pl."""
+        lines = []
+        for thread, stacks in sorted(self.samples.items()):
+            for stack, count in stacks.items():
+                names = [thread] + [f"{name} ({os.path.basename(file)}:{line})" for name, file, line in stack]
+                lines.append(f"{';'.join(names)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _path(profile_id: str, suffix: str, directory: str = None) -> str:
+    return os.path.join(directory or settings.PROFILE_DIR, f"{profile_id}.{suffix}")
+
+
+def save_profile(profiler: SamplingProfiler, meta: Dict[str, Any], directory: str = None, keep: int = None):
+    """Write the speedscope, collapsed and metadata files for one profile, then prune old ones."""
+    directory = directory or settings.PROFILE_DIR
+    keep = settings.PROFILE_KEEP if keep is None else keep
+    private_dir(directory)
+    profile_id = meta["id"]
+    with open(_path(profile_id, "speedscope.json", directory), "w", encoding="utf-8") as f:
+        json.dump(profiler.to_speedscope(f"{meta['method']} {meta['path']}"), f)
+    with open(_path(profile_id, "collapsed.txt", directory), "w", encoding="utf-8") as f:
+        f.write(profiler.to_collapsed())
+    # Metadata last: a profile is listed only once its files are complete
+    with open(_path(profile_id, "meta.json", directory), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    for path in sorted(glob.glob(os.path.join(directory, "*.meta.json")), key=os.path.getmtime, reverse=True)[keep:]:
+        stale = os.path.basename(path)[:-len(".meta.json")]
+        for suffix in ("meta.json", "speedscope.json", "collapsed.txt"):
+            try:
+                os.remove(_path(stale, suffix, directory))
+            except OSError:
+                pass
+
+
+def list_profiles(directory: str = None) -> List[Dict[str, Any]]:
+    """Metadata of the stored profiles, newest first."""
+    profiles = []
+    for path in glob.glob(os.path.join(directory or settings.PROFILE_DIR, "*.meta.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda meta: meta["started_at"], reverse=True)
+
+
+def profile_file(profile_id: str, format: str = "speedscope", directory: str = None) -> Optional[str]:
+    """Path of a stored profile in format (speedscope, collapsed or meta), if it exists."""
+    suffix = {"speedscope": "speedscope.json", "collapsed": "collapsed.txt", "meta": "meta.json"}[format]
+    # Ids are generated hex strings; anything else cannot name a stored profile
+    if not profile_id.isalnum():
+        return None
+    path = _path(profile_id, suffix, directory)
+    return path if os.path.exists(path) else None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles requests selected by header or by sampling."""
+
+    def __init__(self, app, token: str = None, sample_rate: float = None, interval: float = None):
+        self.app = app
+        self.token = (settings.PROFILE_TOKEN if token is None else token).encode()
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.interval = (settings.PROFILE_INTERVAL_MS if interval is None else interval) / 1000
+        self._busy = threading.Lock()
+
+    def _reason(self, scope) -> Optional[str]:
+        if scope["type"] != "http" or scope["path"] not in PROFILED_PATHS:
+            return None
+        if self.token and dict(scope["headers"]).get(PROFILE_HEADER) == self.token:
+            return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        reason = self._reason(scope)
+        if reason is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        status = {}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        stages = collect_timings()
+        profiler = SamplingProfiler(self.interval)
+        started_at, began = time.time(), time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            self._busy.release()
+            meta = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "status": status.get("code"),
+                "reason": reason,
+                "started_at": started_at,
+                "duration_ms": round(1000 * (time.perf_counter() - began), 1),
+                "interval_ms": round(1000 * self.interval, 3),
+                "samples": profiler.count,
+                "pid": os.getpid(),
+                "stages": stages,
+            }
+            try:
+                await run_in_threadpool(save_profile, profiler, meta)
+            except Exception:
+                log.exception("profile_save_failed", profile_id=profile_id)
+
+
+def add_profiling(app: FastAPI):
+    """Install ProfilingMiddleware only if profiling can be triggered."""
+    if settings.PROFILE_TOKEN or settings.PROFILE_SAMPLE_RATE > 0:
+        app.add_middleware(ProfilingMiddleware)
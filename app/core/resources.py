@@ -0,0 +1,124 @@
+"""
+Process-wide resources and the application lifespan.
+
+Heavy client libraries (neo4j, google.generativeai, matplotlib, pandas) are not
+imported at module import. The Neo4j driver and the Gemini model are created on
+first use in the process that uses them, so nothing socket-backed is inherited
+across a gunicorn fork. Both are handed out behind circuit breakers
+(app.core.breaker). With `--preload`, preload() imports the heavy modules and
+compiles the templates once in the master; workers then fork with that work done
+and only open their own connections.
+"""
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
+
+from app.core.breaker import GuardedDriver, GuardedModel, llm_breaker, neo4j_breaker
+from app.core.config import settings
+from app.core.data_version import data_version
+from app.core.log import handler as log_handler
+from app.core.memory import memory_watchdog
+
+GEMINI_MODEL = "gemini-1.5-flash"
+
+# Modules imported before fork when the app is preloaded
+PRELOAD_MODULES = [
+    "neo4j",
+    "numpy",
+    "pandas",
+    "matplotlib.pyplot",
+    "google.generativeai",
+]
+
+
+def pyplot():
+    """matplotlib.pyplot on the Agg backend, imported on first use."""
+    import matplotlib
+    matplotlib.use('Agg')  # Set the backend to Agg before importing pyplot
+    import matplotlib.pyplot as plt
+    return plt
+
+
+class Resources:
+    """Lazily opened Neo4j driver and Gemini model, one per process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._driver = None
+        self._model = None
+
+    def _check_pid(self):
+        # Handles created before a fork belong to the parent; drop them without closing
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._driver = None
+            self._model = None
+
+    @property
+    def driver(self):
+        with self._lock:
+            self._check_pid()
+            if self._driver is None:
+                from neo4j import GraphDatabase
+                self._driver = GraphDatabase.driver(
+                    settings.NEO4J_URI,
+                    auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+                    connection_timeout=settings.NEO4J_CONNECT_TIMEOUT,
+                    connection_acquisition_timeout=settings.NEO4J_ACQUIRE_TIMEOUT,
+                    max_transaction_retry_time=settings.NEO4J_RETRY_TIME,
+                )
+            return GuardedDriver(self._driver, neo4j_breaker)
+
+    @property
+    def model(self):
+        with self._lock:
+            self._check_pid()
+            if self._model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=settings.GEMINI_API_KEY)
+                self._model = genai.GenerativeModel(GEMINI_MODEL)
+            return GuardedModel(self._model, llm_breaker)
+
+    def close(self):
+        with self._lock:
+            if self._driver is not None and self._pid == os.getpid():
+                self._driver.close()
+            self._driver = None
+            self._model = None
+
+
+resources = Resources()
+
+
+def preload(modules: Optional[List[str]] = None):
+    """Import heavy modules and compile templates; safe to run before fork."""
+    import importlib
+    from app.core.templates import env
+
+    pyplot()
+    for module in modules or PRELOAD_MODULES:
+        importlib.import_module(module)
+    for name in env.list_templates(extensions=["html"]):
+        env.get_template(name)
+
+
+def lifespan(on_startup: Callable[[], Awaitable[Any]] = None):
+    """Lifespan handler: starts data-version polling, the memory watchdog and on_startup after fork; closes resources and flushes logs on shutdown."""
+
+    @asynccontextmanager
+    async def handler(app) -> AsyncIterator[None]:
+        data_version.start()
+        memory_watchdog.start()
+        if on_startup is not None:
+            await on_startup()
+        try:
+            yield
+        finally:
+            await memory_watchdog.stop()
+            await data_version.stop()
+            resources.close()
+            log_handler.flush()
+
+    return handler
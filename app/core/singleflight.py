@@ -0,0 +1,49 @@
+"""
+Request coalescing: concurrent callers asking for the same work share one run.
+
+The first caller for a key starts the computation as its own task; callers that
+arrive while it is in flight await the same task and receive the same result (or
+exception). Results are shared objects, so callers must treat them as read-only.
+"""
+import asyncio
+from typing import Any, Callable, Dict, Hashable
+
+from starlette.concurrency import run_in_threadpool
+
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form of free text, e.g. a user question."""
+    return " ".join(text.lower().split()) if text else ""
+
+
+def flight_key(endpoint: str, **params) -> Hashable:
+    """Key for endpoint + parameters, independent of argument order."""
+    return (endpoint, tuple(sorted(params.items())))
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) once for all concurrent callers with the same key.
+
+        Coroutine functions are awaited; plain functions run in the threadpool so
+        blocking Neo4j, Gemini and plotting work stays off the event loop.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            if asyncio.iscoroutinefunction(fn):
+                task = asyncio.ensure_future(fn(*args, **kwargs))
+            else:
+                task = asyncio.ensure_future(run_in_threadpool(fn, *args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # A caller that disconnects must not cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+singleflight = SingleFlight()
@@ -0,0 +1,112 @@
+"""
+Small async stage graphs with per-stage timings.
+
+A handler starts each stage as a task as soon as its inputs are ready and awaits
+it only where the result is needed, so independent stages overlap:
+
+    stages = StageGraph("ask")
+    snapshot = stages.start("snapshot", load_snapshot)        # blocking fn -> threadpool
+    examples = stages.start("few_shot", select, question)
+    plan = await stages.run("route", route_question, question, await snapshot)
+    ...
+    stages.finish()
+
+Stages still running at finish() were speculative and are cancelled. Timings
+are aggregated per graph name in stage_stats, and handed to the current
+request's collector, if any (collect_timings()).
+"""
+import asyncio
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+
+class StageStats:
+    """Count, total, mean and max duration per stage, per graph."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    def record(self, graph: str, timings: Dict[str, float]):
+        with self._lock:
+            stages = self._stats.setdefault(graph, {})
+            for stage, seconds in timings.items():
+                entry = stages.setdefault(stage, {"count": 0, "total": 0.0, "max": 0.0})
+                entry["count"] += 1
+                entry["total"] += seconds
+                entry["max"] = max(entry["max"], seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        with self._lock:
+            return {
+                graph: {
+                    stage: {
+                        "count": entry["count"],
+                        "mean_ms": round(1000 * entry["total"] / entry["count"], 1),
+                        "max_ms": round(1000 * entry["max"], 1),
+                    }
+                    for stage, entry in stages.items()
+                }
+                for graph, stages in self._stats.items()
+            }
+
+
+stage_stats = StageStats()
+
+_collector: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("stage_collector", default=None)
+
+
+def collect_timings() -> List[Dict[str, Any]]:
+    """List that receives {"graph", "timings"} for every StageGraph finished in this context.
+
+    Nested callers (e.g. the request log and the profiler) share the same list.
+    """
+    collected = _collector.get()
+    if collected is None:
+        collected = []
+        _collector.set(collected)
+    return collected
+
+
+class StageGraph:
+    def __init__(self, name: str):
+        self.name = name
+        self.timings: Dict[str, float] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._started = time.perf_counter()
+
+    def start(self, stage: str, fn: Callable, *args, **kwargs) -> asyncio.Task:
+        """Start fn now; coroutine functions run on the loop, anything else in the threadpool."""
+        async def timed():
+            began = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(fn):
+                    return await fn(*args, **kwargs)
+                return await run_in_threadpool(fn, *args, **kwargs)
+            finally:
+                self.timings[stage] = time.perf_counter() - began
+
+        task = asyncio.ensure_future(timed())
+        self._tasks.append(task)
+        return task
+
+    async def run(self, stage: str, fn: Callable, *args, **kwargs) -> Any:
+        return await self.start(stage, fn, *args, **kwargs)
+
+    def finish(self) -> Dict[str, float]:
+        """Cancel unused speculative stages and record the timings."""
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # Retrieved, so an unused failure is not logged as unhandled
+        self.timings["total"] = time.perf_counter() - self._started
+        stage_stats.record(self.name, self.timings)
+        collected = _collector.get()
+        if collected is not None:
+            collected.append({"graph": self.name, "timings": dict(self.timings)})
+        return self.timings
@@ -0,0 +1,35 @@
+"""
+Shared Jinja environment and cached fragment rendering.
+
+One environment is used by every router so compiled templates are shared, and
+compiled bytecode is persisted on disk so new workers skip template compilation.
+"""
+from typing import Hashable
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from app.core.cache import cache
+from app.core.config import settings
+from app.core.paths import private_dir
+
+# Bytecode is loaded with marshal, so the directory must be private
+private_dir(settings.TEMPLATE_CACHE_DIR)
+
+env = Environment(
+    loader=FileSystemLoader("templates"),
+    autoescape=True,
+    auto_reload=settings.TEMPLATE_AUTO_RELOAD,
+    bytecode_cache=FileSystemBytecodeCache(settings.TEMPLATE_CACHE_DIR),
+    cache_size=100,
+)
+templates = Jinja2Templates(env=env)
+
+
+def render_fragment(name: str, key: Hashable, **context) -> str:
+    """Render template name with context, reusing the cached HTML for key if still valid."""
+    cache_key = ("fragment", name, key)
+    html = cache.get(cache_key)
+    if html is None:
+        html = cache.set(cache_key, env.get_template(name).render(**context))
+    return html
@@ -1,19 +1,30 @@
-from neo4j import GraphDatabase
-from app.core.config import settings
+from app.core.resources import resources
 
 class Neo4jClient:
-    def __init__(self):
-        self.driver = GraphDatabase.driver(
-            settings.NEO4J_URI,
-            auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-        )
+    @property
+    def driver(self):
+        return resources.driver
 
     def close(self):
-        self.driver.close()
+        resources.close()
 
     def run_query(self, query: str):
         with self.driver.session() as session:
             result = session.run(query)
             return [record.data() for record in result]
 
+    def stream_query(self, query: str, **parameters):
+        """Yield records one by one while the session is open."""
+        with self.driver.session() as session:
+            yield from session.run(query, parameters)
+
+    def stream_read(self, query: str, parameters: dict = None, timeout: float = None):
+        """Like stream_query, in a read-only transaction: the server rejects any write,
+        and aborts the transaction after timeout seconds."""
+        from neo4j import READ_ACCESS
+
+        with self.driver.session(default_access_mode=READ_ACCESS) as session:
+            with session.begin_transaction(timeout=timeout) as tx:
+                yield from tx.run(query, parameters or {})
+
 neo4j_client = Neo4jClient() 
\ No newline at end of file
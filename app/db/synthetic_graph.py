@@ -0,0 +1,488 @@
+"""
+Synthetic ADC knowledge-graph generator for scale testing.
+
+Produces AntibodyDrugConjugate -> DosageCohort -> PK_Observation / AdverseEventTerm
+graphs that follow the same shape as the production data, including the messy
+string values the endpoints have to cope with ("NOT FOUND", "12.5%",
+"410.2 (455.3 AUCinf)", mixed units).
+
+Usage:
+    python -m app.db.synthetic_graph --cohorts 100000 --neo4j --constraints
+    python -m app.db.synthetic_graph --cohorts 100000 --csv-dir import/
+    python -m app.db.synthetic_graph --clear
+
+--constraints adds UNIQUE constraints on id for the four labels, which keeps
+the MERGEs fast on a large load. They apply to production nodes of those labels
+too, so only use it on a scratch database; --clear drops them again.
+"""
+import argparse
+import csv
+import math
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+
+from app.core.data_version import BUMP_COUNTER_QUERY
+
+# Every synthetic node id starts with this prefix so the data can be removed again
+ID_PREFIX = "syn-"
+
+ANALYTES = ["ADC", "Free Payload", "Total AB"]
+
+# parameter_name -> (relationship type, default unit)
+PK_PARAMETERS = {
+    "Cmax": ("HAS_CMAX", "µg/mL"),
+    "Tmax": ("HAS_TMAX", "days"),
+    "AUCinf": ("HAS_AUC", "µg*day/mL"),
+    "AUClast": ("HAS_AUCLAST", "µg*day/mL"),
+    "Thalf": ("HAS_THALF", "days"),
+}
+
+AE_VOCABULARY = [
+    "Nausea", "Vomiting", "Fatigue", "Anemia", "Neutropenia", "Thrombocytopenia",
+    "Diarrhea", "Alopecia", "Decreased appetite", "Peripheral neuropathy",
+    "Constipation", "Pyrexia", "Headache", "Cough", "Dyspnea", "Stomatitis",
+    "Interstitial lung disease", "Increased AST", "Increased ALT", "Leukopenia",
+    "Lymphopenia", "Hypokalemia", "Rash", "Arthralgia", "Epistaxis",
+    "Keratitis", "Blurred vision", "Infusion-related reaction", "Insomnia", "Dizziness",
+]
+
+ADC_STEMS = [
+    "Trastuzumab", "Sacituzumab", "Polatuzumab", "Enfortumab", "Tisotumab",
+    "Mirvetuximab", "Loncastuximab", "Belantamab", "Brentuximab", "Datopotamab",
+]
+ADC_PAYLOADS = ["deruxtecan", "govitecan", "vedotin", "emtansine", "soravtansine", "tesirine"]
+
+DOSE_LEVELS = [0.3, 0.6, 1.2, 1.8, 2.4, 3.2, 3.6, 4.8, 5.4, 6.4, 8.0, 10.0]
+
+BASE_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class SyntheticADCGraph:
+    """Deterministic generator of synthetic ADC graph rows.
+
+    Rows are produced lazily per cohort, so graphs with hundreds of thousands of
+    cohorts can be streamed into Neo4j or CSV without holding them in memory.
+    """
+
+    def __init__(
+        self,
+        n_cohorts: int,
+        cohorts_per_adc: int = 6,
+        extra_ae_terms: int = 0,
+        aes_per_cohort: int = 8,
+        messy_ratio: float = 0.1,
+        seed: int = 0,
+    ):
+        self.n_cohorts = n_cohorts
+        self.cohorts_per_adc = max(1, cohorts_per_adc)
+        self.n_adcs = max(1, math.ceil(n_cohorts / self.cohorts_per_adc))
+        self.ae_terms = AE_VOCABULARY + [f"AE term {i:05d}" for i in range(extra_ae_terms)]
+        self.aes_per_cohort = min(aes_per_cohort, len(self.ae_terms))
+        self.messy_ratio = messy_ratio
+        self.seed = seed
+
+    def _rng(self, *key: int) -> random.Random:
+        # Independent stream per entity so any slice of the graph is reproducible
+        value = self.seed
+        for part in key:
+            value = value * 1_000_003 + part
+        return random.Random(value)
+
+    def _created_at(self, rng: random.Random) -> str:
+        return (BASE_TIME + timedelta(minutes=rng.randrange(0, 60 * 24 * 365))).isoformat()
+
+    def adc_id(self, index: int) -> str:
+        return f"{ID_PREFIX}adc-{index}"
+
+    def ae_term_id(self, index: int) -> str:
+        return f"{ID_PREFIX}ae-{index}"
+
+    def adcs(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.n_adcs):
+            rng = self._rng(1, index)
+            stem = ADC_STEMS[index % len(ADC_STEMS)]
+            payload = ADC_PAYLOADS[(index // len(ADC_STEMS)) % len(ADC_PAYLOADS)]
+            yield {
+                "id": self.adc_id(index),
+                "name": f"{stem} {payload} (SYN-{index:06d})",
+                "createdAt": self._created_at(rng),
+                "source_document_ref": f"synthetic-{index // 50}.pdf",
+                "doi_ref": f"10.0000/synthetic.{index}",
+            }
+
+    def adverse_event_terms(self) -> Iterator[Dict[str, Any]]:
+        for index, name in enumerate(self.ae_terms):
+            yield {
+                "id": self.ae_term_id(index),
+                "name": name,
+                "createdAt": self._created_at(self._rng(2, index)),
+            }
+
+    def _messy(self, rng: random.Random) -> bool:
+        return rng.random() < self.messy_ratio
+
+    def _pk_value(self, rng: random.Random, parameter: str, value: float, aucinf: float) -> Tuple[str, str]:
+        """Render a PK value and unit the way they appear in the source documents."""
+        _, unit = PK_PARAMETERS[parameter]
+        if self._messy(rng):
+            roll = rng.random()
+            if roll < 0.3:
+                return "NOT FOUND", "NOT FOUND"
+            if roll < 0.6 and parameter in ("AUCinf", "AUClast"):
+                # Compound value listing both AUC flavours in one string
+                return f"{value:.1f} ({aucinf:.1f} AUCinf)", unit
+            if roll < 0.8 and parameter == "Cmax":
+                return f"{value * 1000:.1f}", "ng/mL"
+            if roll < 0.8 and parameter in ("AUCinf", "AUClast"):
+                return f"{value * 1000:.1f}", "ng*day/mL"
+            return f"{value:.2f} ± {value * rng.uniform(0.1, 0.4):.2f}", unit
+        return f"{value:.3g}", unit
+
+    def cohort(self, index: int) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Return (cohort row, PK observation rows, HAS_AE rows) for one cohort."""
+        rng = self._rng(3, index)
+        adc_index = index // self.cohorts_per_adc
+        adc_rng = self._rng(4, adc_index)
+        # Per-ADC exposure profile so dose-response looks plausible within an ADC
+        base_cmax = adc_rng.uniform(5.0, 80.0)
+        exponent = adc_rng.uniform(0.8, 1.2)
+        half_life = adc_rng.uniform(2.0, 12.0)
+
+        position = index % self.cohorts_per_adc
+        dose = DOSE_LEVELS[position % len(DOSE_LEVELS)] * (1 + position // len(DOSE_LEVELS))
+        cohort_id = f"{ID_PREFIX}cohort-{index}"
+        patients = rng.randint(3, 60)
+        cohort = {
+            "id": cohort_id,
+            "adc_id": self.adc_id(adc_index),
+            "name": f"{dose:g} mg/kg",
+            "createdAt": self._created_at(rng),
+            "cohort_pk_notes": "" if rng.random() < 0.7 else "PK evaluable subset",
+            "regimen_for_cohort": rng.choice(["Q3W", "Q2W", "QW", "Days 1 and 8 Q3W"]),
+            "patients_in_cohort": str(patients),
+        }
+
+        pk_rows = []
+        for analyte_index, analyte in enumerate(ANALYTES):
+            scale = (1.0, 0.002, 1.1)[analyte_index]
+            cmax = base_cmax * scale * dose ** exponent * math.exp(rng.gauss(0, 0.2))
+            aucinf = cmax * half_life * rng.uniform(1.1, 1.6)
+            values = {
+                "Cmax": cmax,
+                "Tmax": rng.uniform(0.05, 1.5),
+                "AUCinf": aucinf,
+                "AUClast": aucinf * rng.uniform(0.8, 0.98),
+                "Thalf": half_life * math.exp(rng.gauss(0, 0.1)),
+            }
+            for parameter, raw in values.items():
+                value, unit = self._pk_value(rng, parameter, raw, aucinf)
+                pk_rows.append({
+                    "id": f"{cohort_id}-{parameter}-{analyte_index}",
+                    "cohort_id": cohort_id,
+                    "rel_type": PK_PARAMETERS[parameter][0],
+                    "createdAt": cohort["createdAt"],
+                    "value": value,
+                    "analyte_component": analyte,
+                    "parameter_name": parameter,
+                    "variability": f"CV {rng.randint(10, 60)}%",
+                    "unit": unit,
+                    "metric": "geometric mean" if rng.random() < 0.5 else "mean",
+                    "auc_type_specified": "AUCinf" if parameter == "AUCinf" else "",
+                })
+
+        ae_rows = []
+        for ae_index in rng.sample(range(len(self.ae_terms)), self.aes_per_cohort):
+            percent = min(100.0, rng.expovariate(1 / 15) * (0.5 + dose / 8))
+            count = max(1, round(patients * percent / 100))
+            if self._messy(rng):
+                percentage = rng.choice(["NOT FOUND", f"{percent:.1f}", f"{percent:.0f} %"])
+            else:
+                percentage = f"{percent:.1f}%"
+            grade = rng.choice(["1", "2", "3", "4", "1-2", "≥3"])
+            ae_rows.append({
+                "cohort_id": cohort_id,
+                "ae_id": self.ae_term_id(ae_index),
+                "createdAt": cohort["createdAt"],
+                "grade": grade if not self._messy(rng) else "NOT FOUND",
+                "patientCount": str(count),
+                "patientPercentage": percentage,
+                "drugRelated": rng.choice(["True", "False"]),
+                "isDLT": "True" if grade in ("3", "4", "≥3") and rng.random() < 0.2 else "False",
+            })
+        return cohort, pk_rows, ae_rows
+
+    def cohorts(self) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        for index in range(self.n_cohorts):
+            yield self.cohort(index)
+
+
+# Labels the generator writes -> name of the optional id constraint on them
+LABELS = {
+    "AntibodyDrugConjugate": "syn_adc_id",
+    "DosageCohort": "syn_cohort_id",
+    "PK_Observation": "syn_pk_id",
+    "AdverseEventTerm": "syn_ae_id",
+}
+
+CONSTRAINTS = [
+    f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.id IS UNIQUE"
+    for label, name in LABELS.items()
+]
+DROP_CONSTRAINTS = [f"DROP CONSTRAINT {name} IF EXISTS" for name in LABELS.values()]
+
+LOAD_ADCS = """
+UNWIND $rows AS row
+MERGE (adc:AntibodyDrugConjugate {id: row.id})
+SET adc.name = row.name,
+    adc.createdAt = datetime(row.createdAt),
+    adc.source_document_ref = row.source_document_ref,
+    adc.doi_ref = row.doi_ref
+"""
+
+LOAD_AE_TERMS = """
+UNWIND $rows AS row
+MERGE (ae:AdverseEventTerm {id: row.id})
+SET ae.name = row.name, ae.createdAt = datetime(row.createdAt)
+"""
+
+LOAD_COHORTS = """
+UNWIND $rows AS row
+MATCH (adc:AntibodyDrugConjugate {id: row.adc_id})
+MERGE (cohort:DosageCohort {id: row.id})
+SET cohort.name = row.name,
+    cohort.createdAt = datetime(row.createdAt),
+    cohort.cohort_pk_notes = row.cohort_pk_notes,
+    cohort.regimen_for_cohort = row.regimen_for_cohort,
+    cohort.patients_in_cohort = row.patients_in_cohort
+MERGE (adc)-[:HAS_COHORT]->(cohort)
+"""
+
+# Relationship types cannot be parameterised, so there is one statement per PK relationship
+LOAD_PK_OBSERVATIONS = """
+UNWIND $rows AS row
+MATCH (cohort:DosageCohort {{id: row.cohort_id}})
+MERGE (pk:PK_Observation {{id: row.id}})
+SET pk.createdAt = datetime(row.createdAt),
+    pk.value = row.value,
+    pk.analyte_component = row.analyte_component,
+    pk.parameter_name = row.parameter_name,
+    pk.variability = row.variability,
+    pk.unit = row.unit,
+    pk.metric = row.metric,
+    pk.auc_type_specified = row.auc_type_specified
+MERGE (cohort)-[:{rel_type}]->(pk)
+"""
+
+LOAD_ADVERSE_EVENTS = """
+UNWIND $rows AS row
+MATCH (cohort:DosageCohort {id: row.cohort_id})
+MATCH (ae:AdverseEventTerm {id: row.ae_id})
+MERGE (cohort)-[r:HAS_AE]->(ae)
+SET r.createdAt = datetime(row.createdAt),
+    r.grade = row.grade,
+    r.patientCount = row.patientCount,
+    r.patientPercentage = row.patientPercentage,
+    r.drugRelated = row.drugRelated,
+    r.isDLT = row.isDLT
+"""
+
+# Labels cannot be parameterised, so there is one statement per label
+CLEAR_SYNTHETIC = """
+MATCH (n:{label})
+WHERE n.id STARTS WITH $prefix
+WITH n LIMIT $batch_size
+DETACH DELETE n
+RETURN count(*) AS deleted
+"""
+
+
+def _batches(rows: Iterator[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_into_neo4j(graph: SyntheticADCGraph, driver, batch_size: int = 5000,
+                    constraints: bool = False) -> Dict[str, int]:
+    """Bulk-load the synthetic graph with UNWIND batches. Returns row counts per kind.
+
+    constraints: first create the UNIQUE id constraints (scratch databases only).
+    """
+    counts = {"adcs": 0, "ae_terms": 0, "cohorts": 0, "pk_observations": 0, "adverse_events": 0}
+    with driver.session() as session:
+        if constraints:
+            for statement in CONSTRAINTS:
+                session.run(statement).consume()
+
+        for batch in _batches(graph.adcs(), batch_size):
+            session.run(LOAD_ADCS, rows=batch).consume()
+            counts["adcs"] += len(batch)
+        for batch in _batches(graph.adverse_event_terms(), batch_size):
+            session.run(LOAD_AE_TERMS, rows=batch).consume()
+            counts["ae_terms"] += len(batch)
+
+        cohort_batch, pk_batches, ae_batch = [], {}, []
+
+        def flush():
+            # Cohorts first so the PK / AE statements can MATCH them
+            if cohort_batch:
+                session.run(LOAD_COHORTS, rows=cohort_batch).consume()
+                counts["cohorts"] += len(cohort_batch)
+                cohort_batch.clear()
+            for rel_type, rows in pk_batches.items():
+                if rows:
+                    session.run(LOAD_PK_OBSERVATIONS.format(rel_type=rel_type), rows=rows).consume()
+                    counts["pk_observations"] += len(rows)
+            pk_batches.clear()
+            if ae_batch:
+                session.run(LOAD_ADVERSE_EVENTS, rows=ae_batch).consume()
+                counts["adverse_events"] += len(ae_batch)
+                ae_batch.clear()
+
+        for cohort, pk_rows, ae_rows in graph.cohorts():
+            cohort_batch.append(cohort)
+            for row in pk_rows:
+                pk_batches.setdefault(row["rel_type"], []).append(row)
+            ae_batch.extend(ae_rows)
+            if len(cohort_batch) >= batch_size // 20 or len(ae_batch) >= batch_size:
+                flush()
+        flush()
+        session.run(BUMP_COUNTER_QUERY).consume()
+    return counts
+
+
+def clear_synthetic(driver, batch_size: int = 10000) -> int:
+    """Delete every synthetic node (and its relationships) in batches, then drop the id constraints."""
+    deleted = 0
+    with driver.session() as session:
+        for label in LABELS:
+            query = CLEAR_SYNTHETIC.format(label=label)
+            while True:
+                record = session.run(query, prefix=ID_PREFIX, batch_size=batch_size).single()
+                if not record or not record["deleted"]:
+                    break
+                deleted += record["deleted"]
+        for statement in DROP_CONSTRAINTS:
+            session.run(statement).consume()
+        session.run(BUMP_COUNTER_QUERY).consume()
+    return deleted
+
+
+# neo4j-admin import headers, keyed by output file
+CSV_HEADERS = {
+    "adcs.csv": ["id:ID(ADC)", "name", "createdAt:datetime", "source_document_ref", "doi_ref", ":LABEL"],
+    "ae_terms.csv": ["id:ID(AE)", "name", "createdAt:datetime", ":LABEL"],
+    "cohorts.csv": [
+        "id:ID(Cohort)", "name", "createdAt:datetime", "cohort_pk_notes",
+        "regimen_for_cohort", "patients_in_cohort", ":LABEL",
+    ],
+    "pk_observations.csv": [
+        "id:ID(PK)", "createdAt:datetime", "value", "analyte_component", "parameter_name",
+        "variability", "unit", "metric", "auc_type_specified", ":LABEL",
+    ],
+    "has_cohort.csv": [":START_ID(ADC)", ":END_ID(Cohort)", ":TYPE"],
+    "has_pk.csv": [":START_ID(Cohort)", ":END_ID(PK)", ":TYPE"],
+    "has_ae.csv": [
+        ":START_ID(Cohort)", ":END_ID(AE)", "createdAt:datetime", "grade", "patientCount",
+        "patientPercentage", "drugRelated", "isDLT", ":TYPE",
+    ],
+}
+
+
+def export_csv(graph: SyntheticADCGraph, directory: str) -> Dict[str, int]:
+    """Write neo4j-admin import CSV files into directory. Returns row counts per file."""
+    os.makedirs(directory, exist_ok=True)
+    handles = {name: open(os.path.join(directory, name), "w", newline="", encoding="utf-8") for name in CSV_HEADERS}
+    counts = dict.fromkeys(CSV_HEADERS, 0)
+    try:
+        writers = {name: csv.writer(handle) for name, handle in handles.items()}
+        for name, header in CSV_HEADERS.items():
+            writers[name].writerow(header)
+
+        def write(name: str, row: List[Any]):
+            writers[name].writerow(row)
+            counts[name] += 1
+
+        for adc in graph.adcs():
+            write("adcs.csv", [adc["id"], adc["name"], adc["createdAt"], adc["source_document_ref"],
+                               adc["doi_ref"], "AntibodyDrugConjugate"])
+        for term in graph.adverse_event_terms():
+            write("ae_terms.csv", [term["id"], term["name"], term["createdAt"], "AdverseEventTerm"])
+        for cohort, pk_rows, ae_rows in graph.cohorts():
+            write("cohorts.csv", [cohort["id"], cohort["name"], cohort["createdAt"], cohort["cohort_pk_notes"],
+                                  cohort["regimen_for_cohort"], cohort["patients_in_cohort"], "DosageCohort"])
+            write("has_cohort.csv", [cohort["adc_id"], cohort["id"], "HAS_COHORT"])
+            for pk in pk_rows:
+                write("pk_observations.csv", [pk["id"], pk["createdAt"], pk["value"], pk["analyte_component"],
+                                              pk["parameter_name"], pk["variability"], pk["unit"], pk["metric"],
+                                              pk["auc_type_specified"], "PK_Observation"])
+                write("has_pk.csv", [pk["cohort_id"], pk["id"], pk["rel_type"]])
+            for ae in ae_rows:
+                write("has_ae.csv", [ae["cohort_id"], ae["ae_id"], ae["createdAt"], ae["grade"], ae["patientCount"],
+                                     ae["patientPercentage"], ae["drugRelated"], ae["isDLT"], "HAS_AE"])
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return counts
+
+
+def admin_import_command(directory: str, database: str = "neo4j") -> str:
+    """neo4j-admin command line that imports the files written by export_csv."""
+    path = lambda name: os.path.join(directory, name)
+    return (
+        f"neo4j-admin database import full {database} "
+        f"--nodes={path('adcs.csv')} --nodes={path('ae_terms.csv')} "
+        f"--nodes={path('cohorts.csv')} --nodes={path('pk_observations.csv')} "
+        f"--relationships={path('has_cohort.csv')} --relationships={path('has_pk.csv')} "
+        f"--relationships={path('has_ae.csv')}"
+    )
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic ADC knowledge graph")
+    parser.add_argument("--cohorts", type=int, default=1000, help="number of DosageCohort nodes")
+    parser.add_argument("--cohorts-per-adc", type=int, default=6)
+    parser.add_argument("--aes-per-cohort", type=int, default=8)
+    parser.add_argument("--extra-ae-terms", type=int, default=0, help="grow the AE vocabulary beyond the base list")
+    parser.add_argument("--messy-ratio", type=float, default=0.1, help="share of values rendered in messy formats")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--csv-dir", help="write neo4j-admin import CSV files here")
+    parser.add_argument("--neo4j", action="store_true", help="load directly into the configured Neo4j database")
+    parser.add_argument("--constraints", action="store_true",
+                        help="create UNIQUE id constraints before --neo4j loads (scratch databases only)")
+    parser.add_argument("--clear", action="store_true",
+                        help="delete previously loaded synthetic data and its constraints")
+    args = parser.parse_args(argv)
+
+    graph = SyntheticADCGraph(
+        n_cohorts=args.cohorts,
+        cohorts_per_adc=args.cohorts_per_adc,
+        extra_ae_terms=args.extra_ae_terms,
+        aes_per_cohort=args.aes_per_cohort,
+        messy_ratio=args.messy_ratio,
+        seed=args.seed,
+    )
+
+    if args.clear or args.neo4j:
+        from app.db.neo4j_client import neo4j_client
+        if args.clear:
+            print(f"Deleted {clear_synthetic(neo4j_client.driver)} synthetic nodes")
+        if args.neo4j:
+            print(f"Loaded into Neo4j: {load_into_neo4j(graph, neo4j_client.driver, args.batch_size, args.constraints)}")
+        neo4j_client.close()
+
+    if args.csv_dir:
+        print(f"Wrote CSV files: {export_csv(graph, args.csv_dir)}")
+        print(admin_import_command(args.csv_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+
+@dataclass(slots=True)
+class PKValue:
+    parameter: str
+    analyte: str
+    value: Any
+    unit: str
+
+
+@dataclass(slots=True)
+class AdverseEvent:
+    event: str
+    grade: Any = 'NOT FOUND'
+    count: Any = 'NOT FOUND'
+    percent: Any = 'NOT FOUND'
+    related: Any = 'NOT FOUND'
+
+
+@dataclass(slots=True)
+class CohortRow:
+    """One ADC x dosage cohort with its PK observations and adverse events.
+
+    Field names match the keys the templates and Cypher queries already use.
+    """
+    ADC_Name: str
+    Dosage: str
+    PK_Parameters: List[PKValue] = field(default_factory=list)
+    Adverse_Events: List[AdverseEvent] = field(default_factory=list)
+    # elementId of the cohort node; breaks ties between cohorts sharing a name
+    Cohort_Id: Optional[str] = None
+
+    def pk(self, parameter: str, analyte: str = None):
+        """First PK value for parameter (and analyte, if given), or None."""
+        for item in self.PK_Parameters:
+            if item.parameter == parameter and (analyte is None or item.analyte == analyte):
+                return item
+        return None
+
+    def adverse_event(self, event: str):
+        for item in self.Adverse_Events:
+            if item.event == event:
+                return item
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Any, Dict
+
+
+class ExportQuery(BaseModel):
+    query: str
+    parameters: Dict[str, Any] = {}
+    format: str = "csv"
@@ -0,0 +1,74 @@
+"""
+Inverted indexes over the cohort dataset for the visualization page.
+
+    AE term   -> positions of cohorts reporting it that also have AUC / Cmax data
+    parameter -> positions of cohorts with AUC / Cmax data
+    ADC name  -> positions of its cohorts
+
+Positions index into the sequence returned by load_cohort_rows(). The sorted AE
+vocabulary per parameter is maintained on insert, so the dropdowns read it
+without rescanning the data.
+"""
+from bisect import insort
+from typing import Dict, Iterable, List
+
+from app.models.cohort import CohortRow
+
+INDEXED_PARAMETERS = ('AUC', 'Cmax')
+
+
+class AEIndex:
+    def __init__(self):
+        self.ae_cohorts: Dict[str, Dict[str, List[int]]] = {p: {} for p in INDEXED_PARAMETERS}
+        self.parameter_cohorts: Dict[str, List[int]] = {p: [] for p in INDEXED_PARAMETERS}
+        self.adc_cohorts: Dict[str, List[int]] = {}
+        self._sorted_aes: Dict[str, List[str]] = {p: [] for p in INDEXED_PARAMETERS}
+        self._sorted_adcs: List[str] = []
+        self.size = 0
+
+    def add(self, row: CohortRow):
+        """Index one more cohort; its position is the next index in the dataset list."""
+        self.add_cohort(row.ADC_Name, (pk.parameter for pk in row.PK_Parameters),
+                        (ae.event for ae in row.Adverse_Events))
+
+    def add_cohort(self, adc_name: str, parameters: Iterable[str], events: Iterable[str]):
+        """Index one more cohort from its ADC name, PK parameter names and AE terms."""
+        position = self.size
+        self.size += 1
+
+        if adc_name not in self.adc_cohorts:
+            self.adc_cohorts[adc_name] = []
+            insort(self._sorted_adcs, adc_name)
+        self.adc_cohorts[adc_name].append(position)
+
+        events = list(dict.fromkeys(events))
+        for parameter in set(parameters) & set(INDEXED_PARAMETERS):
+            self.parameter_cohorts[parameter].append(position)
+            by_event = self.ae_cohorts[parameter]
+            for event in events:
+                if event not in by_event:
+                    by_event[event] = []
+                    insort(self._sorted_aes[parameter], event)
+                by_event[event].append(position)
+
+    def add_rows(self, rows: Iterable[CohortRow]) -> 'AEIndex':
+        for row in rows:
+            self.add(row)
+        return self
+
+    def available_aes(self, parameter: str = 'AUC') -> List[str]:
+        """AE terms reported by at least one cohort with data for parameter, sorted."""
+        return self._sorted_aes[parameter]
+
+    def adc_names(self) -> List[str]:
+        return self._sorted_adcs
+
+    def cohorts_with(self, event: str, parameter: str = 'AUC') -> List[int]:
+        return self.ae_cohorts[parameter].get(event, [])
+
+    def cohorts_for_adc(self, adc_name: str) -> List[int]:
+        return self.adc_cohorts.get(adc_name, [])
+
+
+def build_ae_index(rows: Iterable[CohortRow]) -> AEIndex:
+    return AEIndex().add_rows(rows)
@@ -0,0 +1,77 @@
+"""
+Deterministic rendering of /ask answers.
+
+The result table is built locally; the LLM only writes the short Summary and
+Key Findings sections. Pure lookups (a single row or a single column) skip the
+LLM entirely and get a fixed one-line summary.
+"""
+import html
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.templates import env
+
+MAX_TABLE_ROWS = 200
+
+TABLE_START = '<table border="1" cellpadding="6" style="border-collapse: collapse;">'
+HEADER_CELL = '<th style="background-color: #333; color: white;">{}</th>'
+CELL = '<td>{}</td>'
+
+
+def _cell_text(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=str)
+    return html.escape(str(value))
+
+
+def result_columns(results: List[Dict[str, Any]]) -> List[str]:
+    """Column names in order of first appearance."""
+    return list(dict.fromkeys(key for row in results for key in row))
+
+
+def build_result_table(results: List[Dict[str, Any]], max_rows: int = MAX_TABLE_ROWS) -> str:
+    """HTML table for Neo4j / local plan records, with the styling the answer prompt used."""
+    columns = result_columns(results)
+    parts = [TABLE_START, '<thead><tr>']
+    parts += [HEADER_CELL.format(html.escape(column)) for column in columns]
+    parts.append('</tr></thead>\n<tbody>')
+    for row in results[:max_rows]:
+        parts.append('<tr>' + ''.join(CELL.format(_cell_text(row.get(column))) for column in columns) + '</tr>')
+    parts.append('</tbody></table>')
+    if len(results) > max_rows:
+        parts.append(f'<p>Showing the first {max_rows} of {len(results)} rows.</p>')
+    return '\n'.join(parts)
+
+
+def is_lookup(results: List[Dict[str, Any]]) -> bool:
+    """A single record or a single column needs no LLM commentary."""
+    return len(results) == 1 or len(result_columns(results)) == 1
+
+
+def lookup_summary(results: List[Dict[str, Any]]) -> str:
+    count = len(results)
+    return f"Found {count} matching record{'s' if count != 1 else ''}."
+
+
+def parse_sections(text: str) -> Tuple[str, List[str]]:
+    """Read {"summary": ..., "findings": [...]} from the LLM; fall back to the raw text as summary."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.startswith("json"):
+            text = text[4:]
+    try:
+        sections = json.loads(text)
+        summary = str(sections.get("summary", ""))
+        findings = [str(finding) for finding in sections.get("findings", [])][:3]
+    except (ValueError, AttributeError, TypeError):
+        return text, []
+    return summary, findings
+
+
+def render_answer(summary: str, table_html: str, findings: Optional[List[str]] = None) -> str:
+    return env.get_template("_answer.html").render(
+        summary=summary, table_html=table_html, findings=findings or []
+    )
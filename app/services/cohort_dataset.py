@@ -0,0 +1,114 @@
+"""
+The full ADC x cohort dataset, its columnar snapshot and AE index, shared by every app.
+
+All are cached per process in local_cache, a memory tier that drops them when
+the data version moves on; the full dataset never goes to the SQLite or Redis
+tiers. Without SNAPSHOT_DIR each worker fetches it from Neo4j once per data
+version. With SNAPSHOT_DIR set, it is kept as a memory-mapped Arrow snapshot
+(offline_snapshot) shared by all workers through the page cache: one worker
+writes the snapshot for a new version and the others map it.
+"""
+import threading
+from typing import List, Sequence
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import MemoryCache
+from app.core.config import settings
+from app.core.data_version import current_version, data_version
+from app.core.log import get_logger
+from app.core.resources import resources
+from app.models.cohort import CohortRow
+from app.services.ae_index import AEIndex, build_ae_index
+from app.services.cohort_normalizer import normalize_cohorts
+from app.services import offline_snapshot
+from app.services.cohort_rollup import build_rollup_query
+from app.services.cohort_snapshot import CohortSnapshot, build_snapshot
+
+CYPHER_QUERY = build_rollup_query()
+
+STALE_SNAPSHOT_TTL = 60
+
+log = get_logger(__name__)
+
+local_cache = MemoryCache(max_entries=8, ttl=settings.CACHE_TTL)
+data_version.subscribe(local_cache.invalidate)
+
+_lock = threading.Lock()
+
+
+def fetch_cohort_rows() -> List[CohortRow]:
+    """The full ADC x cohort dataset, straight from Neo4j."""
+    with resources.driver.session() as session:
+        processed_data = list(normalize_cohorts(session.run(CYPHER_QUERY)))
+    # Count plus a few sample rows; the full dataset is never serialised for the log
+    log.debug("cohort_rows_fetched", rows=processed_data)
+    return processed_data
+
+def _map_dataset() -> Sequence[CohortRow]:
+    """SnapshotRows over the snapshot for the current version, writing it from Neo4j if no worker has yet."""
+    # Before the first watermark poll the version is unknown (0); any snapshot will do
+    version = current_version()
+    tables = offline_snapshot.load_tables(version or None)
+    if tables is None:
+        with offline_snapshot.refresh_lock():
+            # Another worker may have written the snapshot while this one waited
+            tables = offline_snapshot.load_tables(version or None)
+            if tables is None:
+                try:
+                    processed_data = fetch_cohort_rows()
+                except Exception as e:
+                    tables = offline_snapshot.load_tables()
+                    if tables is None:
+                        raise
+                    log.warning("serving_stale_snapshot", error=e)
+                    # Held briefly so the graph is retried soon
+                    return local_cache.set(("dataset",), offline_snapshot.SnapshotRows(tables), ttl=STALE_SNAPSHOT_TTL)
+                offline_snapshot.write_snapshot(processed_data, version)
+                tables = offline_snapshot.load_tables()
+    return local_cache.set(("dataset",), offline_snapshot.SnapshotRows(tables))
+
+def load_cohort_rows() -> Sequence[CohortRow]:
+    """The full ADC x cohort dataset, from this process's cache, the offline snapshot or Neo4j."""
+    processed_data = local_cache.get(("dataset",))
+    if processed_data is not None:
+        return processed_data
+    with _lock:
+        processed_data = local_cache.get(("dataset",))
+        if processed_data is not None:
+            return processed_data
+        if not offline_snapshot.enabled():
+            return local_cache.set(("dataset",), fetch_cohort_rows())
+        return _map_dataset()
+
+async def warm_dataset():
+    """Map the offline snapshot at worker startup so the first page needs no graph scan."""
+    if offline_snapshot.enabled():
+        try:
+            await run_in_threadpool(load_cohort_rows)
+        except Exception as e:
+            log.exception("dataset_warm_failed")
+
+def load_snapshot() -> CohortSnapshot:
+    """Columnar snapshot of the dataset for locally answered questions."""
+    snapshot = local_cache.get(("snapshot",))
+    if snapshot is None:
+        rows = load_cohort_rows()
+        if isinstance(rows, offline_snapshot.SnapshotRows):
+            snapshot = offline_snapshot.to_cohort_snapshot(rows.tables)
+        else:
+            snapshot = build_snapshot(rows)
+        snapshot = local_cache.set(("snapshot",), snapshot)
+    return snapshot
+
+def load_ae_index() -> AEIndex:
+    """AE / ADC -> cohort position index over load_cohort_rows()."""
+    index = local_cache.get(("ae_index",))
+    if index is None:
+        rows = load_cohort_rows()
+        if isinstance(rows, offline_snapshot.SnapshotRows):
+            index = offline_snapshot.to_ae_index(rows.tables)
+        else:
+            index = build_ae_index(rows)
+        index = local_cache.set(("ae_index",), index)
+    return index
@@ -0,0 +1,133 @@
+"""
+Single-pass normalisation of Neo4j cohort records into typed CohortRow objects.
+
+Accepts both result shapes used in the app: the per-parameter lists returned by
+the /visualize query (AUC_Data, CMAX_Data, ...) and the flat PK_Parameters list
+returned by the chat router query. Works directly on a driver result iterator.
+
+Identical PK values or adverse events of a cohort (e.g. from parallel
+relationships) are kept once, as collect(DISTINCT ...) used to do in Cypher.
+"""
+from typing import Any, Dict, Iterable, Iterator
+
+from app.models.cohort import AdverseEvent, CohortRow, PKValue
+
+NOT_FOUND = 'NOT FOUND'
+
+# Per-parameter result columns -> canonical parameter name
+PK_COLUMNS = {
+    'CMAX_Data': 'Cmax',
+    'TMAX_Data': 'Tmax',
+    'AUC_Data': 'AUC',
+    'AUCLAST_Data': 'AUClast',
+    'THALF_Data': 'Thalf',
+}
+
+# parameter_name as stored on PK_Observation (upper-cased) -> canonical parameter name
+PK_PARAMETER_NAMES = {
+    'CMAX': 'Cmax',
+    'TMAX': 'Tmax',
+    'AUC': 'AUC',
+    'AUCINF': 'AUC',
+    'AUCLAST': 'AUClast',
+    'THALF': 'Thalf',
+}
+
+
+def canonical_parameter(name: str) -> str:
+    return PK_PARAMETER_NAMES.get(name.upper(), name) if name else name
+
+
+def clean_pk_value(value: Any) -> Any:
+    """Extract the single measurement from compound values like '410.2 (455.3 AUCinf)'."""
+    if isinstance(value, str) and '(' in value and ')' in value:
+        if 'AUCinf' in value:
+            return value.split('AUCinf)')[0].split('(')[-1].strip()
+        if 'AUClast' in value:
+            return value.split('AUClast)')[0].split('(')[-1].strip()
+    return value
+
+
+def _pk_value(item: Dict[str, Any], parameter: str):
+    value = clean_pk_value(item.get('value', ''))
+    if not parameter or not value or value == NOT_FOUND:
+        return None
+    unit = item.get('unit') or ''
+    return PKValue(
+        parameter=parameter,
+        analyte=item.get('analyte') or '',
+        value=value,
+        unit=unit if unit != NOT_FOUND else '',
+    )
+
+
+def _distinct_key(*values) -> tuple:
+    # List-valued properties are unhashable; compare them as tuples
+    return tuple(tuple(v) if isinstance(v, list) else v for v in values)
+
+
+def normalize_cohort(record) -> CohortRow:
+    """Normalise one record (neo4j Record or dict) into a CohortRow."""
+    row = CohortRow(ADC_Name=record.get('ADC_Name'), Dosage=record.get('Dosage'), Cohort_Id=record.get('Cohort_Id'))
+    seen = set()
+
+    def append_pk(pk: PKValue):
+        key = _distinct_key(pk.parameter, pk.analyte, pk.value, pk.unit)
+        if key not in seen:
+            seen.add(key)
+            row.PK_Parameters.append(pk)
+
+    flat = record.get('PK_Parameters')
+    if isinstance(flat, list):
+        for item in flat:
+            if isinstance(item, dict):
+                pk = _pk_value(item, canonical_parameter(item.get('parameter')))
+                if pk:
+                    append_pk(pk)
+    else:
+        for column, parameter in PK_COLUMNS.items():
+            items = record.get(column)
+            if isinstance(items, list):
+                for item in items:
+                    if isinstance(item, dict):
+                        pk = _pk_value(item, parameter)
+                        if pk:
+                            append_pk(pk)
+
+    events = record.get('Adverse_Events')
+    if isinstance(events, list):
+        seen_events = set()
+        for item in events:
+            if isinstance(item, dict):
+                event = item.get('event', '')
+                if event and event != NOT_FOUND:
+                    ae = AdverseEvent(
+                        event=event,
+                        grade=item.get('grade', NOT_FOUND),
+                        count=item.get('count', NOT_FOUND),
+                        percent=item.get('percent', NOT_FOUND),
+                        related=item.get('related', NOT_FOUND),
+                    )
+                    key = _distinct_key(ae.event, ae.grade, ae.count, ae.percent, ae.related)
+                    if key not in seen_events:
+                        seen_events.add(key)
+                        row.Adverse_Events.append(ae)
+    return row
+
+
+def normalize_cohorts(records: Iterable) -> Iterator[CohortRow]:
+    """Lazily normalise a stream of cohort records."""
+    for record in records:
+        yield normalize_cohort(record)
+
+
+def plain_records(records: Iterable) -> Iterator[Dict[str, Any]]:
+    """Convert arbitrary query records into plain dicts for JSON / LLM prompts."""
+    for record in records:
+        if hasattr(record, 'data'):
+            yield record.data()
+        else:
+            yield {
+                key: value.to_dict() if hasattr(value, 'to_dict') else value
+                for key, value in record.items()
+            }
@@ -0,0 +1,104 @@
+"""
+Keyset pagination over the ADC x cohort table.
+
+Pages are ordered by (ADC_Name, Dosage, Cohort_Id); the cursor is the last key
+of the previous page, so each page is a bounded index range instead of an
+OFFSET scan. Cohort_Id (the cohort's elementId) keeps the key unique when two
+cohorts of an ADC share a name.
+Filters by ADC, adverse event and PK parameter are pushed down into Cypher and
+applied before the per-cohort rollup.
+"""
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models.cohort import CohortRow
+from app.services.cohort_rollup import PK_RELATIONSHIPS, build_rollup_query
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+ADC_NAMES_QUERY = """
+MATCH (adc:AntibodyDrugConjugate)-[:HAS_COHORT]->(:DosageCohort)
+RETURN DISTINCT adc.name AS ADC_Name
+ORDER BY ADC_Name
+"""
+
+def encode_cursor(adc_name: str, dosage: str, cohort_id: Optional[str]) -> str:
+    raw = json.dumps([adc_name, dosage, cohort_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str, Optional[str]]:
+    try:
+        adc_name, dosage, cohort_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    return adc_name, dosage, cohort_id
+
+
+def cohort_filters(
+    adc: Optional[str] = None,
+    ae: Optional[str] = None,
+    pk: Optional[str] = None,
+) -> Tuple[List[str], Dict[str, Any]]:
+    """WHERE conditions over adc / cohort and their parameters for the ADC, AE and PK filters."""
+    conditions = []
+    params: Dict[str, Any] = {}
+    if adc:
+        params['adc'] = adc
+        conditions.append("adc.name = $adc")
+    if ae:
+        params['ae'] = ae
+        conditions.append("EXISTS { (cohort)-[:HAS_AE]->(:AdverseEventTerm {name: $ae}) }")
+    if pk:
+        if pk not in PK_RELATIONSHIPS:
+            raise ValueError(f"Unknown PK parameter: {pk}")
+        conditions.append(f"EXISTS {{ (cohort)-[:{PK_RELATIONSHIPS[pk]}]->(:PK_Observation) }}")
+    return conditions, params
+
+
+def where_clause(conditions: List[str]) -> str:
+    return "WHERE " + "\n  AND ".join(conditions) if conditions else ""
+
+
+def build_cohort_page_query(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    adc: Optional[str] = None,
+    ae: Optional[str] = None,
+    pk: Optional[str] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Return (cypher, parameters) for one page. Fetches limit + 1 rows to detect a next page."""
+    conditions, params = cohort_filters(adc, ae, pk)
+    params['limit'] = min(max(1, limit), MAX_PAGE_SIZE) + 1
+
+    if cursor:
+        params['after_adc'], params['after_dosage'], params['after_id'] = decode_cursor(cursor)
+        conditions.insert(0, (
+            "(adc.name > $after_adc OR (adc.name = $after_adc AND (cohort.name > $after_dosage"
+            " OR (cohort.name = $after_dosage AND elementId(cohort) > $after_id))))"
+        ))
+    return build_rollup_query(where=where_clause(conditions), paged=True), params
+
+
+def split_page(rows: List[CohortRow], limit: int) -> Tuple[List[CohortRow], Optional[str]]:
+    """Trim the look-ahead row and return (page, next_cursor)."""
+    limit = min(max(1, limit), MAX_PAGE_SIZE)
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last.ADC_Name, last.Dosage, last.Cohort_Id)
+
+
+def first_page(rows: List[CohortRow], adc: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+    """First page of already-loaded, (ADC_Name, Dosage, Cohort_Id)-ordered rows, optionally for one ADC."""
+    selected = []
+    for row in rows:
+        if adc is None or row.ADC_Name == adc:
+            selected.append(row)
+            if len(selected) > limit:
+                break
+    return split_page(selected, limit)
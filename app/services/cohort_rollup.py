@@ -0,0 +1,84 @@
+"""
+Cypher builder for the per-cohort PK / AE rollup.
+
+Chaining one OPTIONAL MATCH per relationship type expands every cohort into the
+product of its PK and AE rows before collect(DISTINCT ...) folds it back, so the
+cost grows with the product of the fan-outs. Here each relationship family is
+collected by its own pattern comprehension, evaluated once per cohort, so the
+rollup is linear in the number of observations. A comprehension returns one
+entry per matching path, so duplicates from parallel relationships are dropped
+by normalize_cohort() rather than with DISTINCT here.
+
+Rows come back in the flat shape normalize_cohorts() reads: ADC_Name, Dosage,
+Cohort_Id (the cohort's elementId), PK_Parameters [{parameter, analyte, value,
+unit}] and Adverse_Events.
+"""
+from typing import Optional, Sequence
+
+# Canonical PK parameter -> relationship type (types cannot be query parameters)
+PK_RELATIONSHIPS = {
+    'Cmax': 'HAS_CMAX',
+    'Tmax': 'HAS_TMAX',
+    'AUC': 'HAS_AUC',
+    'AUClast': 'HAS_AUCLAST',
+    'Thalf': 'HAS_THALF',
+}
+
+COHORT_MATCH = "MATCH (adc:AntibodyDrugConjugate)-[:HAS_COHORT]->(cohort:DosageCohort)"
+
+PK_ROLLUP = """[(cohort)-[pk_rel:{relationships}]->(pk:PK_Observation)
+     WHERE pk.value IS NOT NULL{analyte_filter} | {{
+         parameter: replace(type(pk_rel), 'HAS_', ''),
+         analyte: pk.analyte_component,
+         value: pk.value,
+         unit: pk.unit
+     }}]"""
+
+AE_ROLLUP = """[(cohort)-[ae_rel:HAS_AE]->(ae:AdverseEventTerm)
+     WHERE ae.name IS NOT NULL | {
+         event: ae.name,
+         grade: ae_rel.grade,
+         count: ae_rel.patientCount,
+         percent: ae_rel.patientPercentage,
+         related: ae_rel.drugRelated
+     }]"""
+
+
+def build_rollup_query(
+    where: str = "",
+    paged: bool = False,
+    parameters: Optional[Sequence[str]] = None,
+    analytes: bool = False,
+) -> str:
+    """
+    Cypher returning one rolled-up row per (ADC, cohort), ordered by ADC_Name, Dosage, Cohort_Id.
+
+    where: optional "WHERE ..." clause over adc / cohort, applied before the rollup.
+    paged: keep only the first $limit cohorts, so only those are rolled up.
+    parameters: canonical PK parameters to collect (default: all of PK_RELATIONSHIPS).
+    analytes: only collect PK rows whose analyte_component is in $analytes.
+    """
+    selected = parameters or list(PK_RELATIONSHIPS)
+    unknown = [p for p in selected if p not in PK_RELATIONSHIPS]
+    if unknown:
+        raise ValueError(f"Unknown PK parameter: {', '.join(unknown)}")
+
+    pk_rollup = PK_ROLLUP.format(
+        relationships="|".join(PK_RELATIONSHIPS[p] for p in selected),
+        analyte_filter=" AND pk.analyte_component IN $analytes" if analytes else "",
+    )
+    lines = [COHORT_MATCH]
+    if where:
+        lines.append(where)
+    if paged:
+        lines += ["WITH adc, cohort", "ORDER BY adc.name, cohort.name, elementId(cohort)", "LIMIT $limit"]
+    lines += [
+        "RETURN",
+        "    adc.name AS ADC_Name,",
+        "    cohort.name AS Dosage,",
+        "    elementId(cohort) AS Cohort_Id,",
+        f"    {pk_rollup} AS PK_Parameters,",
+        f"    {AE_ROLLUP} AS Adverse_Events",
+        "ORDER BY ADC_Name, Dosage, Cohort_Id",
+    ]
+    return "\n".join(lines) + "\n"
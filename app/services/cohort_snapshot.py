@@ -0,0 +1,71 @@
+"""
+Columnar in-memory snapshot of the cohort dataset for local analytics.
+
+The normalised CohortRow list is flattened into two long-format DataFrames:
+
+    pk: ADC_Name, Dosage, dose, parameter, analyte, value, unit, raw
+    ae: ADC_Name, Dosage, dose, event, grade, percent, count, related
+
+Numeric columns hold the leading number of the stored string ('0.38 ± 0.11' ->
+0.38, '14.5%' -> 14.5) and NaN where there is none.
+"""
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Iterable, List
+
+from app.models.cohort import CohortRow
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_NUMBER = re.compile(r'[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?')
+
+PK_COLUMNS = ['ADC_Name', 'Dosage', 'dose', 'parameter', 'analyte', 'value', 'unit', 'raw']
+AE_COLUMNS = ['ADC_Name', 'Dosage', 'dose', 'event', 'grade', 'percent', 'count', 'related']
+
+
+def leading_number(value: Any) -> float:
+    """First number in value, or NaN."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = _NUMBER.search(value) if isinstance(value, str) else None
+    return float(match.group()) if match else float('nan')
+
+
+def leading_numbers(values: 'pd.Series') -> 'pd.Series':
+    """leading_number over a column of strings."""
+    return values.astype(object).str.extract(f'({_NUMBER.pattern})', expand=False).astype(float)
+
+
+@dataclass
+class CohortSnapshot:
+    pk: 'pd.DataFrame'
+    ae: 'pd.DataFrame'
+
+    @property
+    def adc_names(self) -> List[str]:
+        return sorted(set(self.pk['ADC_Name']) | set(self.ae['ADC_Name']))
+
+    @property
+    def ae_names(self) -> List[str]:
+        return sorted(self.ae['event'].dropna().unique())
+
+
+def build_snapshot(rows: Iterable[CohortRow]) -> CohortSnapshot:
+    """Flatten normalised cohort rows into the pk / ae frames."""
+    import pandas as pd
+
+    pk_rows, ae_rows = [], []
+    for row in rows:
+        dose = leading_number(row.Dosage)
+        for pk in row.PK_Parameters:
+            pk_rows.append((row.ADC_Name, row.Dosage, dose, pk.parameter, pk.analyte,
+                            leading_number(pk.value), pk.unit, pk.value))
+        for ae in row.Adverse_Events:
+            ae_rows.append((row.ADC_Name, row.Dosage, dose, ae.event, ae.grade,
+                            leading_number(ae.percent), leading_number(ae.count), ae.related))
+
+    return CohortSnapshot(
+        pk=pd.DataFrame(pk_rows, columns=PK_COLUMNS),
+        ae=pd.DataFrame(ae_rows, columns=AE_COLUMNS),
+    )
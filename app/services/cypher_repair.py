@@ -0,0 +1,199 @@
+"""
+Bounded self-repair for LLM-generated Cypher.
+
+A generated query that Neo4j rejects (syntax errors, unknown functions and
+other client errors) is sent back to the LLM together with the error for up to
+CYPHER_REPAIR_ATTEMPTS corrections within CYPHER_REPAIR_DEADLINE seconds.
+Transient and connection errors are raised as they are; rewriting the query
+would not fix them.
+
+A query that returns no rows may simply be right, so the LLM is first asked to
+confirm it, with the EXPLAIN warnings (unknown labels, relationship types or
+properties) as evidence; only a query it does not confirm is rewritten. EXPLAIN
+only runs once a query has come back empty, so a query that answers costs a
+single round trip.
+
+A correction that returned rows is cached under the failing query and the data
+version, so the same failure is fixed without an LLM call next time. Corrections
+of empty results expire after CYPHER_REPAIR_EMPTY_TTL, since new data may make
+the original query answer.
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.admission import Overloaded, llm_pool, run_limited
+from app.core.cache import cache
+from app.core.config import settings
+from app.core.data_version import current_version
+from app.core.log import get_logger
+from app.core.resources import resources
+from app.core.singleflight import normalize_text
+from starlette.concurrency import run_in_threadpool
+
+log = get_logger(__name__)
+
+REPAIR_PROMPT = """The following Neo4j Cypher query was generated to answer a question, but it did not work.
+
+Question: {question}
+
+Query:
+{query}
+
+Problem:
+{problem}
+
+Schema:
+{schema}
+
+Return a corrected Cypher query that answers the question, using only the labels,
+relationship types and properties in the schema. Return only the query, no explanations.
+"""
+
+EMPTY_PROMPT = """The following Neo4j Cypher query was generated to answer a question. It ran
+without errors but returned no rows.
+
+Question: {question}
+
+Query:
+{query}
+
+Problem:
+{problem}
+
+Schema:
+{schema}
+
+If the query correctly answers the question and the data simply has no matching rows,
+reply with the single word {confirmed}. Otherwise return a corrected Cypher query that
+answers the question, using only the labels, relationship types and properties in the
+schema. Return only {confirmed} or the query, no explanations.
+"""
+
+CONFIRMED = "CORRECT"
+
+
+def strip_code_fence(text: str) -> str:
+    """Remove a surrounding ```cypher ... ``` fence from an LLM reply."""
+    text = text.strip()
+    if text.startswith("```"):
+        lines = text.splitlines()
+        text = "\n".join(lines[1:-1]) if len(lines) > 2 else ""
+    return text.strip()
+
+
+def explain_warnings(query: str) -> List[str]:
+    """Planner notifications for query, e.g. unknown labels, without running it."""
+    with resources.driver.session() as session:
+        summary = session.run("EXPLAIN " + query).consume()
+    return [
+        f"{notification.get('title', '')} {notification.get('description', '')}".strip()
+        for notification in summary.notifications or []
+    ]
+
+
+def safe_explain(query: str) -> List[str]:
+    try:
+        return explain_warnings(query)
+    except Exception as e:
+        return [str(e)]
+
+
+def describe_empty(warnings: List[str]) -> str:
+    problem = "The query ran but returned no rows."
+    if warnings:
+        problem += "\nNeo4j warnings:\n" + "\n".join(f"- {w}" for w in warnings)
+    return problem
+
+
+def fix_query(question: str, query: str, problem: str, schema: str, empty: bool = False) -> str:
+    """A corrected query, or CONFIRMED if empty and the LLM judges the query right."""
+    template = EMPTY_PROMPT if empty else REPAIR_PROMPT
+    prompt = template.format(question=question, query=query, problem=problem, schema=schema, confirmed=CONFIRMED)
+    return strip_code_fence(resources.model.generate_content(prompt).text)
+
+
+def repairable(error: Exception) -> bool:
+    """Whether error is Neo4j rejecting the query itself, which a rewrite can fix."""
+    from neo4j.exceptions import ClientError
+    return isinstance(error, ClientError)
+
+
+def _repair_key(query: str):
+    return ("cypher_repair", current_version(), normalize_text(query))
+
+
+async def execute_with_repair(
+    question: str,
+    query: str,
+    run: Callable[[str], List[Dict[str, Any]]],
+    schema: str,
+    attempts: int = None,
+    deadline: float = None,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Run query, repairing it on a Neo4j client error or an empty result the LLM
+    does not confirm; returns (final query, rows).
+
+    Re-raises the last Neo4j error if no attempt ran cleanly, and any other
+    error straight away. An empty result that was confirmed or could not be
+    repaired is returned as-is.
+    """
+    attempts = settings.CYPHER_REPAIR_ATTEMPTS if attempts is None else attempts
+    deadline = time.monotonic() + (settings.CYPHER_REPAIR_DEADLINE if deadline is None else deadline)
+
+    original = query
+    known = await cache.aget(_repair_key(original))
+    if known:
+        query = known
+
+    # Queries that failed, each with the TTL its correction is cached for
+    failed: List[Tuple[str, Optional[float]]] = []
+    rows: List[Dict[str, Any]] = []
+    error = None
+    for attempt in range(attempts + 1):
+        try:
+            rows = await run_in_threadpool(run, query)
+            error = None
+        except Exception as e:
+            if not repairable(e):
+                # Includes Overloaded when Neo4j's breaker is open; there is nothing to repair
+                raise
+            rows, error = [], e
+        if rows:
+            if failed and original != failed[0][0]:
+                # A cached correction failed too; the original now maps to the new one
+                await cache.aset(_repair_key(original), query, failed[0][1])
+            for failure, ttl in failed:
+                await cache.aset(_repair_key(failure), query, ttl)
+            return query, rows
+
+        if attempt == attempts or deadline - time.monotonic() <= 0:
+            break
+        empty = error is None
+        failed.append((query, settings.CYPHER_REPAIR_EMPTY_TTL if empty else None))
+        if empty:
+            problem = describe_empty(await run_in_threadpool(safe_explain, query))
+        else:
+            problem = f"Neo4j error: {error}"
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        log.info("cypher_repair", attempt=attempt + 1, query=query, problem=problem)
+        try:
+            fixed = await asyncio.wait_for(
+                run_limited(llm_pool, fix_query, question, query, problem, schema, empty), remaining
+            )
+        except (Overloaded, asyncio.TimeoutError):
+            # No LLM capacity or time left; answer with what we have
+            break
+        if empty and fixed.strip().upper() == CONFIRMED:
+            log.info("cypher_repair_confirmed", query=query)
+            break
+        if not fixed or fixed in (failure for failure, _ in failed):
+            break
+        query = fixed
+
+    if error is not None:
+        raise error
+    return query, rows
@@ -0,0 +1,215 @@
+"""
+Streaming encoders for bulk exports: CSV, NDJSON, Arrow IPC stream and Parquet.
+
+Each encoder takes an iterator of plain dict rows and yields bytes chunk by
+chunk, holding at most chunk_size rows at a time, so an export of any size runs
+in constant memory. Arrow and Parquet columns are typed from the first chunk:
+int, float and bool columns stay numeric and everything else is written as
+text. Both formats fix the schema before the first batch, so a later value that
+does not fit a numeric column raises ValueError rather than being lost; callers
+whose columns mix types pass them as text_columns. An empty result still writes
+the CSV header or the schema when the columns are known.
+Arrow and Parquet need pyarrow.
+"""
+import csv
+import io
+import json
+from itertools import islice
+from typing import Any, Callable, Collection, Dict, Iterable, Iterator, List, Optional
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _chunks(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _columns(first: Dict[str, Any], columns: Optional[List[str]]) -> List[str]:
+    return list(columns) if columns else list(first.keys())
+
+
+def stream_csv(rows: Iterable[Dict[str, Any]], columns: List[str] = None,
+               chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    header = None
+    for chunk in _chunks(rows, chunk_size):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if header is None:
+            header = _columns(chunk[0], columns)
+            writer.writerow(header)
+        writer.writerows([_text(row.get(name)) for name in header] for row in chunk)
+        yield buf.getvalue().encode('utf-8')
+    if header is None and columns:
+        buf = io.StringIO()
+        csv.writer(buf).writerow(columns)
+        yield buf.getvalue().encode('utf-8')
+
+
+def stream_ndjson(rows: Iterable[Dict[str, Any]], columns: List[str] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    for chunk in _chunks(rows, chunk_size):
+        if columns:
+            chunk = [{name: row.get(name) for name in columns} for row in chunk]
+        yield ''.join(json.dumps(row, default=str) + '\n' for row in chunk).encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back on drain() and keeps counting offsets."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise RuntimeError("Arrow and Parquet exports need the pyarrow package")
+    return pyarrow
+
+
+def _arrow_type(pa, values: List[Any], text: bool = False):
+    present = [v for v in values if v is not None]
+    if text:
+        return pa.string()
+    if present and all(isinstance(v, bool) for v in present):
+        return pa.bool_()
+    if present and all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return pa.int64()
+    if present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return pa.float64()
+    return pa.string()
+
+
+def _converter(pa, field) -> Callable[[Any], Any]:
+    if field.type == pa.string():
+        return _text
+    if field.type == pa.bool_():
+        accepted, cast = (bool,), bool
+    elif field.type == pa.int64():
+        accepted, cast = (int,), int
+    else:
+        accepted, cast = (int, float), float
+
+    def convert(value):
+        if value is None:
+            return None
+        if isinstance(value, bool) is not (cast is bool) or not isinstance(value, accepted):
+            raise ValueError(
+                f"Column {field.name!r} was typed {field.type} from the first rows "
+                f"but later holds {value!r}; convert it with toString() or export as CSV"
+            )
+        return cast(value)
+    return convert
+
+
+def _record_batches(pa, rows: Iterable[Dict[str, Any]], columns: Optional[List[str]], chunk_size: int,
+                    text_columns: Collection[str] = ()):
+    """(schema, batch) per chunk, with the schema fixed by the first chunk. An empty
+    result yields the schema of columns, all text, with no batch."""
+    schema = converters = None
+    for chunk in _chunks(rows, chunk_size):
+        if schema is None:
+            names = _columns(chunk[0], columns)
+            types = [_arrow_type(pa, [row.get(name) for row in chunk], name in text_columns) for name in names]
+            schema = pa.schema(list(zip(names, types)))
+            converters = [_converter(pa, field) for field in schema]
+        arrays = [
+            pa.array([convert(row.get(field.name)) for row in chunk], type=field.type)
+            for field, convert in zip(schema, converters)
+        ]
+        yield schema, pa.RecordBatch.from_arrays(arrays, schema=schema)
+    if schema is None:
+        yield pa.schema([(name, pa.string()) for name in columns or []]), None
+
+
+def stream_arrow(rows: Iterable[Dict[str, Any]], columns: List[str] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, text_columns: Collection[str] = ()) -> Iterator[bytes]:
+    pa = _pyarrow()
+    sink = _ChunkSink()
+    writer = None
+    for schema, batch in _record_batches(pa, rows, columns, chunk_size, text_columns):
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, schema)
+        if batch is not None:
+            writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def stream_parquet(rows: Iterable[Dict[str, Any]], columns: List[str] = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE, text_columns: Collection[str] = ()) -> Iterator[bytes]:
+    pa = _pyarrow()
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    for schema, batch in _record_batches(pa, rows, columns, chunk_size, text_columns):
+        if writer is None:
+            writer = pq.ParquetWriter(sink, schema)
+        # One row group per chunk; the footer is written on close
+        if batch is not None:
+            writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+    'arrow': stream_arrow,
+    'parquet': stream_parquet,
+}
+
+# Formats with a typed schema, which take text_columns
+TYPED_FORMATS = ('arrow', 'parquet')
+
+
+def stream_export(rows: Iterable[Dict[str, Any]], format: str, columns: List[str] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, text_columns: Collection[str] = ()) -> Iterator[bytes]:
+    """Encode rows as format, one chunk of bytes at a time; Arrow and Parquet write text_columns as strings."""
+    if format in TYPED_FORMATS:
+        return ENCODERS[format](rows, columns, chunk_size, text_columns)
+    return ENCODERS[format](rows, columns, chunk_size)
@@ -0,0 +1,160 @@
+"""
+Exposure-response analytics over the columnar cohort snapshot.
+
+Everything is computed in one vectorised pass per call, with no per-ADC or per-AE
+Python loops:
+
+    dose_proportionality - power-model fit  log(y) = log(alpha) + beta * log(dose)
+                           per ADC and exposure parameter
+    dose_normalised      - Cmax / dose and AUC / dose per cohort
+    ae_correlations      - correlation of every AE% column with Cmax and AUC
+
+Cmax and AUC are converted to their base units (µg/mL, µg*day/mL) first. Values
+whose unit cannot be converted are left out.
+"""
+from typing import TYPE_CHECKING, Any, Dict, List
+
+import numpy as np
+
+from app.services.cohort_snapshot import CohortSnapshot
+from app.services.units import BASE_UNITS, UNIT_CONVERSIONS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+EXPOSURE_PARAMETERS = ['Cmax', 'AUC']
+CORRELATION_METHODS = ['spearman', 'pearson']
+MIN_PAIRS = 3
+
+# Smith et al. acceptance interval for the power-model exponent
+PROPORTIONALITY_BOUNDS = (0.8, 1.25)
+
+
+def _records(frame: 'pd.DataFrame') -> List[Dict[str, Any]]:
+    # NaN is not valid JSON
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def exposure_frame(snapshot: CohortSnapshot, analyte: str = 'ADC') -> 'pd.DataFrame':
+    """One row per (ADC_Name, Dosage) with dose, Cmax and AUC in base units."""
+    pk = snapshot.pk[snapshot.pk['parameter'].isin(EXPOSURE_PARAMETERS)
+                     & (snapshot.pk['analyte'] == analyte)]
+    factors = {
+        (parameter, unit): factor
+        for parameter, units in UNIT_CONVERSIONS.items()
+        for unit, factor in units.items()
+    }
+    factor = np.array([factors.get(key, np.nan) for key in zip(pk['parameter'], pk['unit'])], dtype=float)
+    pk = pk.assign(value=pk['value'].to_numpy(dtype=float) * factor).dropna(subset=['value'])
+
+    frame = pk.pivot_table(index=['ADC_Name', 'Dosage', 'dose'], columns='parameter',
+                           values='value', aggfunc='mean')
+    return frame.reindex(columns=EXPOSURE_PARAMETERS).reset_index()
+
+
+def dose_proportionality(exposure: 'pd.DataFrame') -> 'pd.DataFrame':
+    """Least-squares power-model fit per ADC and parameter, from grouped sums."""
+    long = exposure.melt(id_vars=['ADC_Name', 'dose'], value_vars=EXPOSURE_PARAMETERS,
+                         var_name='parameter', value_name='value')
+    long = long[(long['dose'] > 0) & (long['value'] > 0)]
+    x = np.log(long['dose'].to_numpy(dtype=float))
+    y = np.log(long['value'].to_numpy(dtype=float))
+    sums = (
+        long.assign(n=1, sx=x, sy=y, sxx=x * x, sxy=x * y, syy=y * y,
+                    dose_min=long['dose'], dose_max=long['dose'])
+        .groupby(['ADC_Name', 'parameter'], sort=True)
+        .agg({'n': 'sum', 'sx': 'sum', 'sy': 'sum', 'sxx': 'sum', 'sxy': 'sum', 'syy': 'sum',
+              'dose_min': 'min', 'dose_max': 'max'})
+    )
+
+    n = sums['n']
+    sxx = n * sums['sxx'] - sums['sx'] ** 2
+    syy = n * sums['syy'] - sums['sy'] ** 2
+    sxy = n * sums['sxy'] - sums['sx'] * sums['sy']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = (sxy / sxx).where(sxx > 1e-12)
+        alpha = np.exp((sums['sy'] - beta * sums['sx']) / n)
+        r_squared = (sxy ** 2 / (sxx * syy)).where((sxx > 1e-12) & (syy > 1e-12))
+        dose_ratio = sums['dose_max'] / sums['dose_min']
+        log_ratio = np.log(dose_ratio).where(dose_ratio > 1)
+        lower = 1 + np.log(PROPORTIONALITY_BOUNDS[0]) / log_ratio
+        upper = 1 + np.log(PROPORTIONALITY_BOUNDS[1]) / log_ratio
+
+    result = sums[['n']].assign(
+        beta=beta, alpha=alpha, r_squared=r_squared, dose_ratio=dose_ratio,
+        lower=lower, upper=upper,
+        # Point estimate within the Smith interval; no confidence interval is fitted
+        proportional=(beta >= lower) & (beta <= upper),
+        unit=sums.index.get_level_values('parameter').map(BASE_UNITS),
+    )
+    return result[result['beta'].notna()].round(4).reset_index()
+
+
+def dose_normalised(exposure: 'pd.DataFrame') -> 'pd.DataFrame':
+    """Cmax / dose and AUC / dose per cohort."""
+    dose = exposure['dose'].where(exposure['dose'] > 0)
+    normalised = exposure[['ADC_Name', 'Dosage', 'dose']].copy()
+    for parameter in EXPOSURE_PARAMETERS:
+        normalised[f'{parameter}_per_dose'] = exposure[parameter] / dose
+    return normalised.round(6)
+
+
+def _rank_columns(values: np.ndarray) -> np.ndarray:
+    """Average ranks down each column, ignoring NaN."""
+    import pandas as pd
+
+    return pd.DataFrame(values).rank(axis=0, method='average').to_numpy()
+
+
+def ae_correlations(
+    snapshot: CohortSnapshot,
+    exposure: 'pd.DataFrame',
+    method: str = 'spearman',
+    min_pairs: int = MIN_PAIRS,
+) -> 'pd.DataFrame':
+    """Correlation of every AE% with Cmax and AUC across cohorts, using pairwise-complete data."""
+    import pandas as pd
+
+    ae = snapshot.ae.dropna(subset=['event']).pivot_table(
+        index=['ADC_Name', 'Dosage'], columns='event', values='percent', aggfunc='mean'
+    )
+    merged = exposure.set_index(['ADC_Name', 'Dosage']).join(ae, how='inner')
+    events = list(ae.columns)
+    responses = merged[events].to_numpy(dtype=float)
+
+    frames = []
+    for parameter in EXPOSURE_PARAMETERS:
+        exposure_values = merged[parameter].to_numpy(dtype=float)
+        # Cohort x AE matrices holding only the pairs where both values exist
+        mask = ~np.isnan(responses) & ~np.isnan(exposure_values)[:, None]
+        y = np.where(mask, responses, np.nan)
+        x = np.where(mask, exposure_values[:, None], np.nan)
+        if method == 'spearman':
+            x, y = _rank_columns(x), _rank_columns(y)
+
+        n = mask.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = x - np.nanmean(x, axis=0)
+            y = y - np.nanmean(y, axis=0)
+            r = np.nansum(x * y, axis=0) / np.sqrt(np.nansum(x * x, axis=0) * np.nansum(y * y, axis=0))
+        frames.append(pd.DataFrame({'event': events, 'parameter': parameter, 'r': r, 'n': n}))
+
+    result = pd.concat(frames, ignore_index=True)
+    result = result[(result['n'] >= min_pairs) & result['r'].notna()]
+    result = result.assign(abs_r=result['r'].abs()).sort_values(['abs_r', 'event'], ascending=[False, True])
+    return result.drop(columns='abs_r').round(4).reset_index(drop=True)
+
+
+def exposure_response(snapshot: CohortSnapshot, analyte: str = 'ADC', method: str = 'spearman') -> Dict[str, Any]:
+    """All exposure-response results for one analyte as JSON-ready records."""
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"Unknown correlation method: {method}")
+    exposure = exposure_frame(snapshot, analyte)
+    return {
+        "analyte": analyte,
+        "method": method,
+        "units": BASE_UNITS,
+        "dose_proportionality": _records(dose_proportionality(exposure)),
+        "dose_normalised": _records(dose_normalised(exposure)),
+        "ae_correlations": _records(ae_correlations(snapshot, exposure, method)),
+    }
@@ -0,0 +1,474 @@
+"""
+Few-shot example retrieval for Cypher generation.
+
+The example pool starts with the hand-written seed queries below and grows with
+question -> Cypher pairs whose generated query returned rows as written; queries
+that needed a repair are not learned. Examples are
+indexed with TF-IDF over the question plus the labels and relationship types
+the query touches, and only the top-k most similar are put in the prompt.
+
+Learned pairs come from user questions, so they are treated as untrusted:
+only read-only queries the server ran in a read transaction are offered, a pair
+is rejected unless the question is one short line and the query has no
+comments, procedure calls or long string literals, and at most
+max_learned_in_prompt learned pairs go into any one prompt next to the seeds.
+
+Learned pairs are appended to a JSON-lines file shared by all workers; each
+worker picks up lines added by the others on its next lookup. Once the file
+holds twice max_learned lines it is rewritten with the newest max_learned
+pairs; workers notice the new file and reload it.
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.paths import private_file
+from app.core.singleflight import normalize_text
+
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    (
+        'Get all the dosage cohorts across ADCs with Nausea as an AE.',
+        """
+MATCH (adc:AntibodyDrugConjugate)-[:HAS_COHORT]->(cohort:DosageCohort)-[r:HAS_AE]->(ae:AdverseEventTerm)
+WHERE ae.name = 'Nausea'
+RETURN adc.name AS ADC_Name, cohort.name AS Cohort_Dosage, r.grade AS Grade, r.patientPercentage AS Incidence, r.patientCount AS Patient_Count
+ORDER BY ADC_Name, Cohort_Dosage
+""",
+    ),
+    (
+        'Find cohorts with no adverse events.',
+        """
+MATCH (c:DosageCohort)
+WHERE NOT EXISTS((c)-[:HAS_AE]->(:AdverseEventTerm))
+RETURN c.id, c.name
+ORDER BY c.name
+""",
+    ),
+    (
+        'Get PK parameters for a specific ADC.',
+        """
+MATCH (adc:AntibodyDrugConjugate)-[:HAS_COHORT]->(cohort:DosageCohort)
+WHERE adc.name CONTAINS 'T-DM1'
+OPTIONAL MATCH (cohort)-[:HAS_CMAX]->(cmax:PK_Observation)
+OPTIONAL MATCH (cohort)-[:HAS_TMAX]->(tmax:PK_Observation)
+RETURN adc.name AS ADC_Name, cohort.name AS Dosage, cmax.value AS Cmax_Value, cmax.unit AS Cmax_Unit, tmax.value AS Tmax_Value, tmax.unit AS Tmax_Unit
+ORDER BY Dosage
+""",
+    ),
+    (
+        'See a high-level count of all data types.',
+        """
+MATCH (n)
+RETURN labels(n) AS NodeType, count(n) AS Count
+ORDER BY Count DESC
+""",
+    ),
+    (
+        'List all ADCs and their main components.',
+        """
+MATCH (adc:AntibodyDrugConjugate)
+OPTIONAL MATCH (adc)-[:HAS_TARGET]->(target:TargetAntigen)
+OPTIONAL MATCH (adc)-[:USES_PAYLOAD_AGENT]->(payload:PayloadAgent)
+OPTIONAL MATCH (adc)-[:HAS_LINKER_TYPE]->(linker:LinkerType)
+RETURN adc.name AS ADC, target.name AS Target, payload.name AS Payload, linker.name AS Linker
+ORDER BY ADC
+""",
+    ),
+    (
+        'Find which studies investigated which ADCs.',
+        """
+MATCH (study:Study)-[:INVESTIGATES_ADC]->(adc:AntibodyDrugConjugate)
+RETURN study.study_identifier AS StudyID, study.title AS StudyTitle, adc.name AS ADC_Investigated
+""",
+    ),
+    (
+        'Find the most common adverse events across all studies.',
+        """
+MATCH ()-[r:HAS_AE]->(ae:AdverseEventTerm)
+RETURN ae.name AS AdverseEvent, count(r) AS NumberOfTimesReported
+ORDER BY NumberOfTimesReported DESC
+LIMIT 15
+""",
+    ),
+    (
+        'Find all Dose-Limiting Toxicities (DLTs) for a ADC named .',
+        """
+MATCH (adc:AntibodyDrugConjugate {name: 'Your_ADC_Name_Here'})-[:HAS_COHORT]->(cohort)-[r:HAS_AE]->(ae:AdverseEventTerm)
+WHERE r.isDLT = "True"
+RETURN cohort.name AS Dosage, ae.name AS DoseLimitingToxicity, r.grade AS Grade, r.patientCount AS PatientCount
+ORDER BY toInteger(r.grade) DESC
+""",
+    ),
+    (
+        'Find high-grade (Grade 3+) adverse events associated with a specific payload.',
+        """
+MATCH (payload:PayloadAgent {name: 'MMAE'})<-[:USES_PAYLOAD_AGENT]-(adc)-[:HAS_COHORT]->(cohort)-[r:HAS_AE]->(ae:AdverseEventTerm)
+WHERE toInteger(r.grade) >= 3
+RETURN adc.name AS ADC, cohort.name AS Dosage, ae.name AS HighGradeAE, r.grade AS Grade
+ORDER BY ADC, Grade DESC
+""",
+    ),
+    (
+        'Find all ADCs that use a specific linker type.',
+        """
+MATCH (adc:AntibodyDrugConjugate)-[:HAS_LINKER_TYPE]->(linker:LinkerType)
+WHERE linker.name CONTAINS 'cleavable'
+RETURN adc.name AS ADC, linker.name AS LinkerType
+""",
+    ),
+    (
+        'Compare the Cmax values for two different ADCs.',
+        """
+MATCH (adc:AntibodyDrugConjugate)-[:HAS_COHORT]->(cohort)-[]->(pk:PK_Observation)
+WHERE adc.name IN ['ADC_Name_1', 'ADC_Name_2'] AND pk.parameter_name = 'Cmax'
+RETURN adc.name AS ADC, cohort.name AS Dosage, pk.value AS Cmax_Value, pk.unit AS Unit
+ORDER BY ADC, toFloat(pk.value) DESC
+""",
+    ),
+    (
+        'Quickly identify cohorts where no adverse events were recorded.',
+        """
+MATCH (c:DosageCohort)
+WHERE NOT (c)-[:HAS_AE]->()
+RETURN c.name AS Cohort_Without_AE_Data
+""",
+    ),
+    (
+        'Find drugs in your database that are missing a relationship to a key component, like a payload.',
+        """
+MATCH (adc:AntibodyDrugConjugate)
+WHERE NOT (adc)-[:USES_PAYLOAD_AGENT]->()
+RETURN adc.name AS ADC_Missing_Payload_Info
+""",
+    ),
+    (
+        'Get a comprehensive table of PK parameters and adverse events for ADCs and their cohorts.',
+        """
+MATCH (adc:AntibodyDrugConjugate)-[:HAS_COHORT]->(cohort:DosageCohort)
+OPTIONAL MATCH (cohort)-->(pk:PK_Observation)
+OPTIONAL MATCH (cohort)-[ae_rel:HAS_AE]->(ae:AdverseEventTerm)
+WITH adc, cohort,
+     collect(DISTINCT {
+         parameter: pk.parameter_name,
+         analyte: pk.analyte_component,
+         value: pk.value,
+         unit: pk.unit
+     }) AS pk_data,
+     collect(DISTINCT {
+         event: ae.name,
+         grade: ae_rel.grade,
+         count: ae_rel.patientCount,
+         percent: ae_rel.patientPercentage,
+         related: ae_rel.drugRelated
+     }) AS ae_data
+RETURN adc.name AS ADC_Name, cohort.name AS Dosage,
+       [item IN pk_data WHERE item.parameter IS NOT NULL] AS PK_Parameters,
+       [item IN ae_data WHERE item.event IS NOT NULL] AS Adverse_Events
+ORDER BY ADC_Name, Dosage
+""",
+    ),
+    (
+        'Identify adverse event (AE) incidence based on dose exposure and compare across different ADCs.',
+        """
+MATCH (adc:AntibodyDrugConjugate)-[:HAS_COHORT]->(cohort:DosageCohort)-[r:HAS_AE]->(ae:AdverseEventTerm)
+WHERE r.patientPercentage IS NOT NULL AND r.patientPercentage <> 'NOT FOUND' AND r.patientPercentage <> ''
+RETURN adc.name AS ADC, ae.name AS AdverseEvent, cohort.name AS DoseLevel,
+       toFloat(split(cohort.name, ' ')[0]) AS DoseValue,
+       toFloat(replace(r.patientPercentage, '%', '')) AS IncidencePercentage,
+       r.grade AS Grade
+ORDER BY ADC, AdverseEvent, DoseValue
+""",
+    ),
+    (
+        'Do ADCs with the same payload cause similar side effects, even if their targets are different?',
+        """
+MATCH (payload:PayloadAgent)<-[:USES_PAYLOAD_AGENT]-(adc1:AntibodyDrugConjugate),
+      (payload)<-[:USES_PAYLOAD_AGENT]-(adc2:AntibodyDrugConjugate)
+WHERE adc1 <> adc2
+MATCH (adc1)-[:HAS_COHORT]->()-[r1:HAS_AE]->(ae:AdverseEventTerm),
+      (adc2)-[:HAS_COHORT]->()-[r2:HAS_AE]->(ae)
+RETURN payload.name AS SharedPayload, adc1.name AS ADC1, adc2.name AS ADC2, ae.name AS CommonAdverseEvent
+ORDER BY SharedPayload, CommonAdverseEvent
+""",
+    ),
+    (
+        'Analyze the AE profile for a drug based on its study phase.',
+        """
+MATCH (phase:StudyPhase)<-[:HAS_STUDY_PHASE]-(study:Study)-[:INVESTIGATES_ADC]->(adc:AntibodyDrugConjugate),
+      (study)-[:INCLUDES_COHORT]->(cohort:DosageCohort)-[r:HAS_AE]->(ae:AdverseEventTerm)
+WHERE r.patientPercentage IS NOT NULL AND r.patientPercentage <> 'NOT FOUND'
+RETURN adc.name AS ADC, phase.name AS StudyPhase, ae.name AS AdverseEvent,
+       avg(toFloat(replace(r.patientPercentage, '%', ''))) AS AvgIncidenceInPhase
+ORDER BY ADC, AdverseEvent, StudyPhase
+""",
+    ),
+    (
+        'List all ADCs currently in a specific phase of development.',
+        """
+MATCH (adc:AntibodyDrugConjugate)<-[:INVESTIGATES_ADC]-(study:Study)-[:HAS_STUDY_PHASE]->(phase:StudyPhase)
+WHERE phase.name CONTAINS '2'
+RETURN DISTINCT adc.name AS ADC_In_Phase_2, study.study_identifier AS StudyID, study.title AS StudyTitle
+""",
+    ),
+    (
+        'Find the dose at which an AE of special interest first appears at a clinically significant rate.',
+        """
+MATCH (adc:AntibodyDrugConjugate)-[:HAS_COHORT]->(cohort)-[r:HAS_AE]->(ae:AdverseEventTerm {name: 'Neutropenia'})
+WHERE toFloat(replace(r.patientPercentage, '%', '')) > 10
+WITH adc, cohort, toFloat(split(cohort.name, ' ')[0]) AS doseValue
+RETURN adc.name AS ADC, min(doseValue) AS FirstDoseForAE_Over10Percent
+ORDER BY ADC
+""",
+    ),
+    (
+        'How does the Cmax of the ADC analyte change as the dose increases for Trastuzumab deruxtecan (DS-8201)?',
+        """
+MATCH (adc:AntibodyDrugConjugate)-[:HAS_COHORT]->(cohort)-[:HAS_CMAX]->(pk:PK_Observation)
+WHERE adc.name CONTAINS 'Trastuzumab deruxtecan (DS-8201)' AND pk.analyte_component = 'ADC'
+RETURN
+    adc.name AS ADC,
+    cohort.name AS Cohort_Dose,
+    toFloat(pk.value) AS Cmax_Value
+ORDER BY Cmax_Value
+""",
+    ),
+    (
+        'How does the AUC (Area Under the Curve) for the main ADC analyte compare between T-DM1 and Polatuzumab vedotin (pola)?',
+        """
+MATCH (adc:AntibodyDrugConjugate)-[:HAS_COHORT]->(cohort)-[:HAS_AUC]->(pk:PK_Observation)
+WHERE adc.name IN ['Trastuzumab emtansine (T-DM1)', 'Polatuzumab vedotin (pola)'] AND pk.analyte_component = 'ADC'
+RETURN
+    adc.name AS ADC,
+    cohort.name AS Cohort_Dose,
+    pk.value AS AUC_Value,
+    pk.unit AS Unit
+ORDER BY ADC, toFloat(pk.value)
+""",
+    ),
+    (
+        'Give me all general AEs in ADC: Sacituzumab govitecan (SG, IMMU-132)',
+        """
+MATCH (study:Study)-[:INVESTIGATES_ADC]->(adc:AntibodyDrugConjugate)
+WHERE adc.name CONTAINS 'Sacituzumab govitecan (SG, IMMU-132)'
+RETURN
+    adc.name AS ADC,
+    study.generalAEsMentioned AS General_Adverse_Events
+""",
+    ),
+]
+
+# Folds common phrasings onto the vocabulary used by the graph
+SYNONYMS = {
+    'adverse': 'ae', 'aes': 'ae', 'toxicity': 'ae', 'toxicities': 'ae', 'side': 'ae',
+    'effects': 'ae', 'effect': 'ae', 'dlt': 'dlt', 'dlts': 'dlt',
+    'dose': 'dosage', 'doses': 'dosage', 'dosing': 'dosage', 'cohorts': 'cohort',
+    'adcs': 'adc', 'drug': 'adc', 'drugs': 'adc', 'conjugate': 'adc',
+    'exposure': 'auc', 'aucinf': 'auc', 'peak': 'cmax', 'half': 'thalf', 'halflife': 'thalf',
+    'payloads': 'payload', 'linkers': 'linker', 'targets': 'target', 'studies': 'study',
+    'phases': 'phase', 'events': 'event',
+}
+STOP_WORDS = {
+    'a', 'an', 'the', 'of', 'for', 'in', 'on', 'to', 'and', 'or', 'is', 'are', 'was', 'were',
+    'what', 'which', 'how', 'do', 'does', 'me', 'give', 'show', 'all', 'with', 'by', 'as',
+    'at', 'it', 'its', 'their', 'that', 'this', 'be', 'can', 'i', 'from', 'across',
+}
+WRITE_CLAUSES = re.compile(r'\b(CREATE|MERGE|DELETE|DETACH|SET|REMOVE|DROP|LOAD\s+CSV)\b', re.IGNORECASE)
+# Procedure calls may read or write; neither belongs in a learned example
+UNLEARNABLE_CLAUSES = re.compile(r'\b(CALL|FOREACH)\b', re.IGNORECASE)
+# Comments would carry free text from a learned pair into the prompt
+CYPHER_COMMENT = re.compile(r'//|/\*')
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+MAX_QUESTION_CHARS = 300
+MAX_CYPHER_CHARS = 2000
+MAX_LITERAL_CHARS = 100
+SCHEMA_NAMES = re.compile(r'\[\w*:(\w+)|\(\w*:(\w+)')
+
+
+def tokenize(text: str) -> List[str]:
+    words = re.findall(r'[a-z0-9]+', text.lower())
+    return [SYNONYMS.get(w, w) for w in words if w not in STOP_WORDS]
+
+
+def schema_terms(cypher: str) -> List[str]:
+    """Labels and relationship types a query touches, as words (HAS_CMAX -> cmax)."""
+    terms = []
+    for match in SCHEMA_NAMES.finditer(cypher):
+        name = match.group(1) or match.group(2)
+        name = re.sub(r'^HAS_', '', name)
+        terms += tokenize(re.sub(r'(?<=[a-z])(?=[A-Z])|_', ' ', name))
+    return terms
+
+
+class FewShotIndex:
+    """TF-IDF index over question -> Cypher examples."""
+
+    def __init__(self, seed: List[Tuple[str, str]] = None, store_path: str = "", max_learned: int = 500,
+                 max_learned_in_prompt: int = 1):
+        # Stored pairs go into prompts, so the store must not be writable by anyone else
+        self.store_path = private_file(store_path) if store_path else store_path
+        self.max_learned = max_learned
+        self.max_learned_in_prompt = max_learned_in_prompt
+        self._lock = threading.Lock()
+        self._seed = [(q, c.strip()) for q, c in (seed or [])]
+        self._learned: List[Tuple[str, str]] = []
+        self._questions = {normalize_text(q) for q, _ in self._seed}
+        self._offset = 0
+        self._lines = 0
+        self._inode = None
+        self._matrix: Optional[np.ndarray] = None
+        self._vocabulary: Dict[str, int] = {}
+        self._idf: Optional[np.ndarray] = None
+
+    @property
+    def examples(self) -> List[Tuple[str, str]]:
+        return self._seed + self._learned
+
+    def _refresh(self):
+        """Pick up pairs appended to the store since the last read, by any worker."""
+        if not self.store_path:
+            return
+        try:
+            stat = os.stat(self.store_path)
+        except OSError:
+            return
+        if stat.st_ino != self._inode:
+            # First read, or another worker compacted the store: reload it from the start
+            self._inode = stat.st_ino
+            self._offset = self._lines = 0
+            self._learned = []
+            self._questions = {normalize_text(q) for q, _ in self._seed}
+            self._matrix = None
+        if stat.st_size <= self._offset:
+            return
+        with open(self.store_path, encoding='utf-8') as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # Another worker is mid-write; read it next time
+                self._offset += len(line.encode('utf-8'))
+                self._lines += 1
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                if self.acceptable(item['question'], item['cypher']):
+                    self._remember(item['question'], item['cypher'])
+
+    def _remember(self, question: str, cypher: str) -> bool:
+        key = normalize_text(question)
+        if key in self._questions:
+            return False
+        self._questions.add(key)
+        self._learned.append((question, cypher))
+        if len(self._learned) > self.max_learned:
+            dropped, _ = self._learned.pop(0)
+            self._questions.discard(normalize_text(dropped))
+        self._matrix = None
+        return True
+
+    def _build(self):
+        documents = [Counter(tokenize(q) + schema_terms(c)) for q, c in self.examples]
+        self._vocabulary = {}
+        for document in documents:
+            for term in document:
+                self._vocabulary.setdefault(term, len(self._vocabulary))
+        counts = np.zeros((len(documents), len(self._vocabulary)))
+        for row, document in enumerate(documents):
+            for term, count in document.items():
+                counts[row, self._vocabulary[term]] = 1 + math.log(count)
+        document_frequency = (counts > 0).sum(axis=0)
+        self._idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+        matrix = counts * self._idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self._matrix = matrix / np.where(norms == 0, 1, norms)
+
+    def _vector(self, question: str) -> np.ndarray:
+        vector = np.zeros(len(self._vocabulary))
+        for term, count in Counter(tokenize(question)).items():
+            if term in self._vocabulary:
+                vector[self._vocabulary[term]] = 1 + math.log(count)
+        vector *= self._idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def select(self, question: str, k: int = 4) -> List[Tuple[str, str]]:
+        """The k examples most similar to question, best first, with at most
+        max_learned_in_prompt of them learned rather than seed examples."""
+        with self._lock:
+            self._refresh()
+            if self._matrix is None:
+                self._build()
+            examples = self.examples
+            scores = self._matrix @ self._vector(question)
+        selected, learned = [], 0
+        for i in np.argsort(-scores, kind='stable'):
+            if i >= len(self._seed):
+                if learned >= self.max_learned_in_prompt:
+                    continue
+                learned += 1
+            selected.append(examples[i])
+            if len(selected) == k:
+                break
+        return selected
+
+    def _compact(self):
+        """Rewrite the store with the learned pairs this worker holds (the newest max_learned)."""
+        tmp = f"{self.store_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for question, cypher in self._learned:
+                f.write(json.dumps({'question': question, 'cypher': cypher}) + '\n')
+        # A pair another worker appends to the old file meanwhile is lost; the pool is only a cache
+        os.replace(tmp, self.store_path)
+        stat = os.stat(self.store_path)
+        self._inode, self._offset, self._lines = stat.st_ino, stat.st_size, len(self._learned)
+
+    @staticmethod
+    def acceptable(question: str, cypher: str) -> bool:
+        """Whether a pair is safe to show to the LLM as an example (see the module docstring)."""
+        if not question or not cypher or len(question) > MAX_QUESTION_CHARS or len(cypher) > MAX_CYPHER_CHARS:
+            return False
+        if not question.isprintable() or WRITE_CLAUSES.search(cypher) or UNLEARNABLE_CLAUSES.search(cypher):
+            return False
+        literals = STRING_LITERAL.findall(cypher)
+        if any(len(literal) > MAX_LITERAL_CHARS or '\n' in literal for literal in literals):
+            return False
+        return not CYPHER_COMMENT.search(STRING_LITERAL.sub("''", cypher))
+
+    def add(self, question: str, cypher: str) -> bool:
+        """Add a pair whose query answered in a read transaction; returns False if it was
+        already known or not acceptable."""
+        question, cypher = ' '.join(question.split()), cypher.strip()
+        if not self.acceptable(question, cypher):
+            return False
+        with self._lock:
+            self._refresh()
+            if not self._remember(question, cypher):
+                return False
+            if self.store_path:
+                if self._lines + 1 > 2 * self.max_learned:
+                    self._compact()
+                    return True
+                line = json.dumps({'question': question, 'cypher': cypher}) + '\n'
+                # One small O_APPEND write per line keeps concurrent workers from interleaving
+                with open(self.store_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        return True
+
+
+def format_examples(examples: List[Tuple[str, str]]) -> str:
+    """Render examples in the // Qn: comment style used by the prompt."""
+    return "\n\n".join(
+        f"// Q{number}: {question}\n{cypher};" for number, (question, cypher) in enumerate(examples, 1)
+    )
+
+
+fewshot_index = FewShotIndex(
+    SEED_EXAMPLES, settings.FEWSHOT_STORE_PATH, settings.FEWSHOT_MAX_LEARNED, settings.FEWSHOT_MAX_LEARNED_IN_PROMPT
+)
@@ -0,0 +1,14 @@
+"""
+Shared styling for server-side plots.
+
+Plots are drawn on the long-lived templates in plot_templates, which never go
+through pyplot or create a figure per request.
+"""
+import numpy as np
+
+
+def palette(count: int):
+    """count evenly spaced Set3 colours."""
+    from matplotlib import colormaps
+
+    return colormaps['Set3'](np.linspace(0, 1, count))
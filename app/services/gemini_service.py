@@ -1,13 +1,16 @@
-import google.generativeai as genai
-from app.core.config import settings
+from app.core.admission import Overloaded
+from app.core.log import get_logger
+from app.core.resources import resources
 from typing import List, Dict, Any
 
+log = get_logger(__name__)
+
 class GeminiService:
-    def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel("gemini-1.5-flash")
+    @property
+    def model(self):
+        return resources.model
 
-    async def generate_cypher(self, question: str, schema_hint: str = "") -> str:
+    async def generate_cypher(self, question: str, schema_hint: str = "", examples: str = "") -> str:
         prompt = f"""
 You are a Cypher expert specializing in medical and pharmaceutical data analysis.
 Given a user's natural language question, convert it into a Cypher query that will extract relevant insights.
@@ -19,6 +22,9 @@ Follow these guidelines:
 
 Schema: {schema_hint}
 
+Example queries:
+{examples}
+
 Question: {question}
 
 Generate a Cypher query that will help answer this question. Only return the Cypher query without any explanations.
@@ -122,13 +128,14 @@ User's Question: {query}
 Please provide a natural, conversational response focusing on the most relevant aspects to the user's question."""
 
             # Generate response using Gemini
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content(prompt)
+            response = self.model.generate_content(prompt)
             
             return response.text.strip()
 
+        except Overloaded:
+            raise
         except Exception as e:
-            print(f"Error generating insights: {str(e)}")
+            log.exception("insights_failed")
             return "I apologize, but I couldn't generate insights from the data at this moment. Please try again or rephrase your question."
 
     def _extract_study_info(self, data: Dict[str, Any]) -> str:
@@ -224,112 +231,17 @@ Please provide a clear, conversational analysis that:
 Keep the response natural and easy to understand."""
 
             # Generate the final response
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content(prompt)
+            response = self.model.generate_content(prompt)
             
             # Return only the natural language response
             return response.text.strip()
             
+        except Overloaded:
+            raise
         except Exception as e:
-            print(f"Error in response generation: {str(e)}")
+            log.exception("response_generation_failed")
             return "I apologize, but I'm having trouble analyzing the study data right now. Could you please try asking your question again?"
 
-    def _format_table(self, data: List[Dict[str, Any]]) -> str:
-        """Format data as an HTML table with specific styling."""
-        if not data:
-            return "No data available"
-            
-        # Define the column structure
-        pk_params = {
-            'Tmax': {'unit': ''},  # No specific unit for Tmax
-            'Cmax': {'unit': 'µg/mL'},
-            'AUCinf': {'unit': 'day µg/mL'},
-            'AUClast': {'unit': ''},
-            'Thalf': {'unit': 'days'}
-        }
-        pk_columns = list(pk_params.keys())
-        adc_columns = ['ADC', 'Free Payload', 'Total AB']
-        
-        # Extract adverse event columns (they end with %)
-        ae_columns = []
-        for key in data[0].keys():
-            if '(%)' in key or key.endswith('%'):
-                ae_columns.append(key)
-        ae_columns.sort()
-        
-        # Create the table HTML with specific styling
-        html = ['''<table class="data-table" style="border-collapse: collapse; width: 100%; font-family: Arial, sans-serif;">''']
-        
-        # First header row with main categories
-        html.append('<tr>')
-        html.append('<th colspan="2" style="border: 1px solid black;"></th>')  # Empty space for ADC name and Dosage Cohort
-        html.append('<th colspan="15" style="border: 1px solid black; text-align: center; background-color: #f5f5f5;">PK Parameter</th>')
-        html.append(f'<th colspan="{len(ae_columns)}" style="border: 1px solid black; text-align: center; background-color: #f5f5f5;">Adverse Event Terms %</th>')
-        html.append('</tr>')
-        
-        # Second header row with PK parameter names
-        html.append('<tr>')
-        html.append('<th colspan="2" style="border: 1px solid black;"></th>')
-        for pk in pk_columns:
-            html.append(f'<th colspan="3" style="border: 1px solid black; text-align: center; background-color: #f5f5f5;">{pk}</th>')
-        for ae in ae_columns:
-            html.append(f'<th rowspan="2" style="border: 1px solid black; text-align: center; background-color: #f5f5f5;">{ae.replace(" (%)", "")}</th>')
-        html.append('</tr>')
-        
-        # Third header row with sub-columns
-        html.append('<tr>')
-        html.append('<th style="border: 1px solid black; background-color: #f5f5f5;">ADC name</th>')
-        html.append('<th style="border: 1px solid black; background-color: #f5f5f5;">Dosage Cohort</th>')
-        for _ in pk_columns:
-            for col in adc_columns:
-                html.append(f'<th style="border: 1px solid black; text-align: center; background-color: #f5f5f5;">{col}</th>')
-        html.append('</tr>')
-        
-        # Group data by ADC name
-        adc_groups = {}
-        for item in data:
-            adc_name = item.get('ADC name', 'Unknown')
-            if adc_name not in adc_groups:
-                adc_groups[adc_name] = []
-            adc_groups[adc_name].append(item)
-        
-        # Add data rows
-        for adc_name, items in adc_groups.items():
-            for i, item in enumerate(items):
-                html.append('<tr>')
-                
-                # Add ADC name only for first row of each group
-                if i == 0:
-                    html.append(f'<td rowspan="{len(items)}" style="border: 1px solid black; padding: 8px;">{adc_name}</td>')
-                
-                # Add dosage cohort
-                html.append(f'<td style="border: 1px solid black; padding: 8px;">{item.get("Dosage Cohort", "")}</td>')
-                
-                # Add PK parameters with units
-                for pk in pk_columns:
-                    for col in adc_columns:
-                        key = f"{pk} {col}"
-                        value = item.get(key, "NA")
-                        if value != "NA" and pk_params[pk]['unit']:
-                            if isinstance(value, (int, float)):
-                                value = f"{value} {pk_params[pk]['unit']}"
-                        html.append(f'<td style="border: 1px solid black; text-align: center; padding: 8px;">{value}</td>')
-                
-                # Add adverse events (percentages)
-                for ae in ae_columns:
-                    value = item.get(ae, "0")
-                    if value != "NA":
-                        value = str(value)  # Ensure it's a string
-                        if not value.endswith('%'):
-                            value = f"{value}"  # Don't add % as it's in the header
-                    html.append(f'<td style="border: 1px solid black; text-align: center; padding: 8px;">{value}</td>')
-                
-                html.append('</tr>')
-        
-        html.append('</table>')
-        
-        return '\n'.join(html)
-
 def format_basic_response(results):
     """Fallback function to format results in a basic way if LLM fails"""
     if not results:
@@ -0,0 +1,299 @@
+"""
+Offline Arrow IPC snapshot of the normalised cohort dataset.
+
+The CohortRow list behind /visualize and /update-plot is written to SNAPSHOT_DIR
+as three uncompressed Arrow IPC files, named by the data version (the graph
+watermark hash) they were built from:
+
+    cohorts-<version>.arrow   position, ADC_Name, Dosage, Cohort_Id
+    pk-<version>.arrow        cohort, parameter, analyte, value, unit
+    ae-<version>.arrow        cohort, event, grade, count, percent, related
+    manifest.json             the current version and its files
+
+Workers memory-map the files, so the column buffers are shared page cache
+across gunicorn processes rather than a per-worker graph scan. The tables stay
+the worker's copy of the dataset: SnapshotRows builds a CohortRow only when it
+is read, and the analytics frames and AE index are built from the columns. A
+worker that starts before the graph is reachable serves the newest snapshot on
+disk; Neo4j is only needed when the watermark moves on, and refresh_lock makes
+the first worker to notice write the next snapshot while the others wait for it.
+
+Requires pyarrow; the feature is off unless SNAPSHOT_DIR is set.
+
+    python -m app.services.offline_snapshot export   # write one from Neo4j now
+    python -m app.services.offline_snapshot info
+"""
+import argparse
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from collections.abc import Sequence
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.cohort import AdverseEvent, CohortRow, PKValue
+from app.services.ae_index import AEIndex
+from app.services.cohort_snapshot import AE_COLUMNS, PK_COLUMNS, CohortSnapshot, leading_numbers
+
+MANIFEST = "manifest.json"
+LOCK = ".lock"
+TABLES = ("cohorts", "pk", "ae")
+
+_lock = threading.Lock()
+# version -> mapped tables, so repeat loads in a process reuse the same mapping
+_mapped: Dict[int, Dict[str, Any]] = {}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise RuntimeError("SNAPSHOT_DIR is set but the pyarrow package is not installed")
+    return pyarrow
+
+
+def _text(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def to_tables(rows: List[CohortRow]) -> Dict[str, Any]:
+    """Long-format Arrow tables for rows; positions follow list order."""
+    pa = _pyarrow()
+    cohorts = {"position": [], "ADC_Name": [], "Dosage": [], "Cohort_Id": []}
+    pk = {"cohort": [], "parameter": [], "analyte": [], "value": [], "unit": []}
+    ae = {"cohort": [], "event": [], "grade": [], "count": [], "percent": [], "related": []}
+    for position, row in enumerate(rows):
+        cohorts["position"].append(position)
+        cohorts["ADC_Name"].append(row.ADC_Name)
+        cohorts["Dosage"].append(row.Dosage)
+        cohorts["Cohort_Id"].append(row.Cohort_Id)
+        for item in row.PK_Parameters:
+            pk["cohort"].append(position)
+            pk["parameter"].append(item.parameter)
+            pk["analyte"].append(item.analyte)
+            pk["value"].append(_text(item.value))
+            pk["unit"].append(item.unit)
+        for item in row.Adverse_Events:
+            ae["cohort"].append(position)
+            ae["event"].append(item.event)
+            ae["grade"].append(_text(item.grade))
+            ae["count"].append(_text(item.count))
+            ae["percent"].append(_text(item.percent))
+            ae["related"].append(_text(item.related))
+
+    def table(columns: Dict[str, list], index: str):
+        arrays = {
+            name: pa.array(values, type=pa.int32() if name == index else pa.string())
+            for name, values in columns.items()
+        }
+        return pa.table(arrays)
+
+    return {"cohorts": table(cohorts, "position"), "pk": table(pk, "cohort"), "ae": table(ae, "cohort")}
+
+
+class SnapshotRows(Sequence):
+    """The CohortRow sequence over mapped tables; each row is built when it is read."""
+
+    def __init__(self, tables: Dict[str, Any]):
+        self.tables = tables
+        cohorts = tables["cohorts"]
+        self._adc_names = cohorts.column("ADC_Name")
+        self._dosages = cohorts.column("Dosage")
+        # Snapshots written before Cohort_Id was stored lack the column
+        self._cohort_ids = cohorts.column("Cohort_Id") if "Cohort_Id" in cohorts.column_names else None
+        # pk / ae rows are written in cohort order, so each cohort owns one contiguous slice
+        positions = np.arange(cohorts.num_rows + 1)
+        self._pk_offsets = np.searchsorted(tables["pk"].column("cohort").to_numpy(), positions)
+        self._ae_offsets = np.searchsorted(tables["ae"].column("cohort").to_numpy(), positions)
+
+    def __len__(self) -> int:
+        return self.tables["cohorts"].num_rows
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        row = CohortRow(
+            ADC_Name=self._adc_names[position].as_py(),
+            Dosage=self._dosages[position].as_py(),
+            Cohort_Id=None if self._cohort_ids is None else self._cohort_ids[position].as_py(),
+        )
+        start, stop = self._pk_offsets[position], self._pk_offsets[position + 1]
+        for item in self.tables["pk"].slice(start, stop - start).drop_columns(["cohort"]).to_pylist():
+            row.PK_Parameters.append(PKValue(**item))
+        start, stop = self._ae_offsets[position], self._ae_offsets[position + 1]
+        for item in self.tables["ae"].slice(start, stop - start).drop_columns(["cohort"]).to_pylist():
+            row.Adverse_Events.append(AdverseEvent(**item))
+        return row
+
+
+def to_cohort_snapshot(tables: Dict[str, Any]) -> CohortSnapshot:
+    """The pk / ae frames of cohort_snapshot, built from the columns without CohortRow objects."""
+    import pandas as pd
+
+    cohorts = tables["cohorts"].select(["ADC_Name", "Dosage"]).to_pandas()
+    cohorts["dose"] = leading_numbers(cohorts["Dosage"])
+
+    def frame(table):
+        items = table.to_pandas()
+        owners = cohorts.iloc[items.pop("cohort").to_numpy()].reset_index(drop=True)
+        return pd.concat([owners, items], axis=1)
+
+    pk = frame(tables["pk"])
+    pk["raw"] = pk["value"]
+    pk["value"] = leading_numbers(pk["raw"])
+    ae = frame(tables["ae"])
+    ae["percent"] = leading_numbers(ae["percent"])
+    ae["count"] = leading_numbers(ae["count"])
+    return CohortSnapshot(pk=pk[PK_COLUMNS], ae=ae[AE_COLUMNS])
+
+
+def to_ae_index(tables: Dict[str, Any]) -> AEIndex:
+    """The AE index, built from the ADC, parameter and event columns."""
+    cohorts = tables["cohorts"]
+    parameters = [[] for _ in range(cohorts.num_rows)]
+    for cohort, parameter in zip(*(tables["pk"].column(name).to_pylist() for name in ("cohort", "parameter"))):
+        parameters[cohort].append(parameter)
+    events = [[] for _ in range(cohorts.num_rows)]
+    for cohort, event in zip(*(tables["ae"].column(name).to_pylist() for name in ("cohort", "event"))):
+        events[cohort].append(event)
+    index = AEIndex()
+    for adc_name, cohort_parameters, cohort_events in zip(cohorts.column("ADC_Name").to_pylist(), parameters, events):
+        index.add_cohort(adc_name, cohort_parameters, cohort_events)
+    return index
+
+
+def read_manifest(directory: str = None) -> Optional[Dict[str, Any]]:
+    path = os.path.join(directory or settings.SNAPSHOT_DIR, MANIFEST)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _replace_atomically(path: str, write):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def write_snapshot(rows: List[CohortRow], version: int, directory: str = None, keep: int = None) -> Dict[str, Any]:
+    """Write rows as the snapshot for version and point the manifest at it."""
+    pa = _pyarrow()
+    directory = directory or settings.SNAPSHOT_DIR
+    keep = settings.SNAPSHOT_KEEP if keep is None else keep
+    os.makedirs(directory, exist_ok=True)
+
+    files = {}
+    for name, table in to_tables(rows).items():
+        files[name] = f"{name}-{version}.arrow"
+
+        def write(tmp, table=table):
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        _replace_atomically(os.path.join(directory, files[name]), write)
+
+    manifest = {"version": version, "files": files, "rows": len(rows), "written_at": time.time()}
+
+    def write_manifest(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+    _replace_atomically(os.path.join(directory, MANIFEST), write_manifest)
+    _prune(directory, keep)
+    return manifest
+
+
+def _prune(directory: str, keep: int):
+    """Delete all but the newest `keep` versions; workers holding a mapping keep their pages."""
+    paths = sorted(glob.glob(os.path.join(directory, "cohorts-*.arrow")), key=os.path.getmtime, reverse=True)
+    for path in paths[max(1, keep):]:
+        version = os.path.basename(path)[len("cohorts-"):-len(".arrow")]
+        for name in TABLES:
+            try:
+                os.remove(os.path.join(directory, f"{name}-{version}.arrow"))
+            except OSError:
+                pass
+
+
+def map_snapshot(directory: str = None) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """(version, tables) for the current snapshot, memory-mapped; None if there is none."""
+    directory = directory or settings.SNAPSHOT_DIR
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+    version = manifest["version"]
+    with _lock:
+        if version not in _mapped:
+            pa = _pyarrow()
+            tables = {}
+            for name in TABLES:
+                source = pa.memory_map(os.path.join(directory, manifest["files"][name]), "r")
+                tables[name] = pa.ipc.open_file(source).read_all()
+            # Only the current version stays mapped in this process
+            _mapped.clear()
+            _mapped[version] = tables
+        return version, _mapped[version]
+
+
+def load_tables(version: Optional[int] = None, directory: str = None) -> Optional[Dict[str, Any]]:
+    """Mapped tables of the snapshot, if it exists and (when given) matches version."""
+    mapped = map_snapshot(directory)
+    if mapped is None or (version is not None and mapped[0] != version):
+        return None
+    return mapped[1]
+
+
+@contextmanager
+def refresh_lock(directory: str = None) -> Iterator[None]:
+    """Hold the snapshot directory's lock file, so one process writes a new snapshot while the rest wait."""
+    directory = directory or settings.SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def enabled() -> bool:
+    return bool(settings.SNAPSHOT_DIR)
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Export / inspect the offline cohort snapshot")
+    parser.add_argument("command", choices=["export", "info"])
+    parser.add_argument("--dir", default=settings.SNAPSHOT_DIR, help="snapshot directory (default SNAPSHOT_DIR)")
+    args = parser.parse_args(argv)
+    if not args.dir:
+        parser.error("set SNAPSHOT_DIR or pass --dir")
+
+    if args.command == "export":
+        from app.core.data_version import current_version, data_version
+        from app.core.resources import resources
+        from app.services.cohort_dataset import fetch_cohort_rows
+
+        data_version.poll()
+        with refresh_lock(args.dir):
+            manifest = write_snapshot(fetch_cohort_rows(), current_version(), args.dir)
+        resources.close()
+    else:
+        manifest = read_manifest(args.dir)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Pre-laid-out scatter plot templates for the dashboard plots.
+
+Each plot kind keeps a small pool of figures whose canvas, axes position and
+single PathCollection are built once. A render only swaps the data into it
+(set_offsets / set_facecolors), rescales the axes, sets the labels and the
+legend, and prints the PNG straight from the Agg canvas. The axes leave a fixed
+margin on the right for the legend, so no tight_layout or bbox_inches='tight'
+pass is needed: each render draws the figure exactly once.
+
+Templates live for the whole process and never touch pyplot. A template is
+used by one thread at a time; the pool grows to the render concurrency.
+"""
+import base64
+import io
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+FIGSIZE = (10, 6)
+# left, bottom, width, height of the axes in inches; the space to the right holds the legend
+AXES_INCHES = (0.8, 0.6, 6.2, 5.1)
+LEGEND_ANCHOR = (1.05, 1)
+# Minimum gap in inches between the legend and the figure edge
+LEGEND_MARGIN = 0.1
+
+Point = Tuple[float, float, str]
+
+
+class ScatterTemplate:
+    def __init__(self, figsize: Tuple[float, float] = FIGSIZE):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.figsize = figsize
+        self.figure = Figure(figsize=figsize)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_axes((0, 0, 1, 1))
+        self.points = self.ax.scatter(np.empty(0), np.empty(0))
+        self._legend_key = None
+        self._resize(0, 0)
+
+    def render(self, points: Sequence[Point], colors: Dict[str, Sequence[float]],
+               xlabel: str, ylabel: str) -> str:
+        """PNG of points (x, y, ADC name) as base64; colours are keyed by normalised ADC name."""
+        ax = self.ax
+        offsets = np.array([(x, y) for x, y, _ in points], dtype=float).reshape(-1, 2)
+        keys = [name.lower().strip() for _, _, name in points]
+        self.points.set_offsets(offsets)
+        self.points.set_facecolors([colors[key] for key in keys])
+
+        # Autoscale to this data only, with matplotlib's default margins
+        ax.ignore_existing_data_limits = True
+        if len(offsets):
+            ax.update_datalim(offsets)
+        ax.autoscale_view()
+
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        self._set_legend(points, keys, colors)
+
+        buf = io.BytesIO()
+        self.canvas.print_png(buf)
+        return base64.b64encode(buf.getvalue()).decode('utf-8')
+
+    def _set_legend(self, points: Sequence[Point], keys: List[str], colors):
+        """One marker per ADC in order of first appearance; rebuilt only when the ADCs change."""
+        from matplotlib.lines import Line2D
+
+        entries = {}
+        for (_, _, name), key in zip(points, keys):
+            if key not in entries:
+                entries[key] = (name, tuple(colors[key]))
+        legend_key = tuple(entries.values())
+        if legend_key == self._legend_key:
+            return
+        self._legend_key = legend_key
+
+        if self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+        self._resize(0, 0)
+        if not entries:
+            return
+        size = np.sqrt(self.points.get_sizes()[0])
+        handles = [
+            Line2D([], [], linestyle='', marker='o', markersize=size,
+                   markerfacecolor=color, markeredgecolor=color, label=name)
+            for name, color in entries.values()
+        ]
+        legend = self.ax.legend(handles=handles, bbox_to_anchor=LEGEND_ANCHOR, loc='upper left')
+
+        # Measure only the legend and grow the canvas if it does not fit
+        box = legend.get_window_extent(self.canvas.get_renderer())
+        dpi = self.figure.dpi
+        width, height = self.figsize
+        extra_width = max(0.0, box.x1 / dpi + LEGEND_MARGIN - width)
+        extra_height = max(0.0, LEGEND_MARGIN - box.y0 / dpi)
+        if extra_width or extra_height:
+            self._resize(extra_width, extra_height)
+
+    def _resize(self, extra_width: float, extra_height: float):
+        """Base size plus extra inches; the axes keep their size and distance from the top left."""
+        width, height = self.figsize[0] + extra_width, self.figsize[1] + extra_height
+        left, bottom, axes_width, axes_height = AXES_INCHES
+        self.figure.set_size_inches(width, height)
+        self.ax.set_position((left / width, (bottom + extra_height) / height,
+                              axes_width / width, axes_height / height))
+
+
+_lock = threading.Lock()
+_idle: Dict[str, List[ScatterTemplate]] = {}
+_created = 0
+
+
+def render_scatter(kind: str, points: Sequence[Point], colors: Dict[str, Sequence[float]],
+                   xlabel: str, ylabel: str) -> str:
+    """Render points on an idle template of this plot kind, creating one if none is idle."""
+    global _created
+    with _lock:
+        idle = _idle.setdefault(kind, [])
+        template = idle.pop() if idle else None
+        if template is None:
+            _created += 1
+    if template is None:
+        template = ScatterTemplate()
+    try:
+        return template.render(points, colors, xlabel, ylabel)
+    finally:
+        with _lock:
+            _idle[kind].append(template)
+
+
+def template_count() -> int:
+    """Templates created in this process."""
+    return _created
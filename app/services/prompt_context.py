@@ -0,0 +1,75 @@
+"""
+Question-specific context for the Cypher generation prompt.
+
+The graph schema is kept as tagged lines so the prompt carries only the parts a
+question needs: PK relationships for the parameters it asks about, AE terms
+when it asks about safety. Questions that name neither get the full schema.
+"""
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.services.cohort_rollup import PK_RELATIONSHIPS
+from app.services.query_router import AE_PATTERN, mentioned_parameters
+
+# (line, tag): None is always kept, 'ae' / 'pk' with the AE / PK part, a PK parameter with that parameter
+SCHEMA_NODES: List[Tuple[str, Optional[str]]] = [
+    ("(adc:AntibodyDrugConjugate) with properties: id, name, createdAt, source_document_ref, doi_ref", None),
+    ("(cohort:DosageCohort) with properties: id, name, createdAt, cohort_pk_notes, regimen_for_cohort, patients_in_cohort", None),
+    ("(ae:AdverseEventTerm) with properties: id, name, createdAt", 'ae'),
+    ("(pk:PK_Observation) with properties: id, createdAt, value, analyte_component, parameter_name, variability, unit, metric, auc_type_specified", 'pk'),
+]
+SCHEMA_RELATIONSHIPS: List[Tuple[str, Optional[str]]] = [
+    ("(adc:AntibodyDrugConjugate)-[:HAS_COHORT]->(cohort:DosageCohort)", None),
+    ("(cohort)-[r:HAS_AE]->(ae:AdverseEventTerm) with properties: patientPercentage, isDLT, grade, drugRelated, patientCount", 'ae'),
+    ("(cohort)-[:HAS_AUC]->(pk:PK_Observation)", 'AUC'),
+    ("(cohort)-[:HAS_CMAX]->(pk:PK_Observation)", 'Cmax'),
+    ("(cohort)-[:HAS_TMAX]->(pk:PK_Observation)", 'Tmax'),
+    ("(cohort)-[:HAS_THALF]->(pk:PK_Observation)", 'Thalf'),
+    ("(cohort)-[:HAS_AUCLAST]->(pk:PK_Observation)", 'AUClast'),
+]
+
+PK_WORDS = re.compile(r'\bpk\b|pharmacokinetic|exposure|concentration|clearance|analyte')
+
+
+def render_schema(tags: Optional[Set[str]] = None) -> str:
+    """Schema text in the prompt's layout; tags=None keeps every line."""
+    def keep(tag):
+        return tags is None or tag is None or tag in tags
+
+    nodes = "\n".join(f"    - {line}" for line, tag in SCHEMA_NODES if keep(tag))
+    relationships = "\n".join(f"    - {line}" for line, tag in SCHEMA_RELATIONSHIPS if keep(tag))
+    return (
+        "    Nodes and their properties:\n" + nodes + "\n    \n"
+        "    Relationships:\n" + relationships + "\n"
+    )
+
+
+FULL_SCHEMA = render_schema()
+
+
+def prune_schema(question: str, entities: Dict[str, List[str]] = None) -> str:
+    """Schema lines relevant to question; the full schema when it names no PK parameter or AE."""
+    text = question.lower()
+    parameters = [p for p in mentioned_parameters(question) if p in PK_RELATIONSHIPS]
+    wants_ae = bool(AE_PATTERN.search(text) or (entities and entities.get('events')))
+    wants_pk = bool(parameters or PK_WORDS.search(text))
+    if not wants_ae and not wants_pk:
+        return FULL_SCHEMA
+
+    tags: Set[str] = set()
+    if wants_ae:
+        tags.add('ae')
+    if wants_pk:
+        tags.add('pk')
+        tags.update(parameters or PK_RELATIONSHIPS)
+    return render_schema(tags)
+
+
+def format_entities(entities: Dict[str, List[str]]) -> str:
+    """Prompt lines giving the exact stored spelling of names the question mentions."""
+    lines = []
+    if entities.get('adcs'):
+        lines.append("ADC names (use exactly): " + "; ".join(entities['adcs']))
+    if entities.get('events'):
+        lines.append("Adverse event names (use exactly): " + "; ".join(entities['events']))
+    return "\n".join(lines)
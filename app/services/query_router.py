@@ -0,0 +1,209 @@
+"""
+Routes /ask questions either to a local plan over the cohort snapshot or to Cypher.
+
+Aggregate questions about PK parameters and adverse event incidence are answered
+from the in-memory CohortSnapshot with pandas, without a Neo4j round trip or an
+LLM query-generation call. A question is routed locally only if all of it fits
+a supported shape: once the PK terms, ADC and AE names are removed, only
+FILLER_WORDS may remain. Questions with conditions a plan cannot express
+(negation, grades, DLTs, drug relatedness, numeric thresholds, payload, linker
+or target filters) and questions about studies or other graph structure return
+no plan and go through the Cypher path as before.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.services.cohort_snapshot import CohortSnapshot
+
+# Question pattern -> canonical PK parameter. AUClast is tested before AUC.
+PK_PATTERNS = [
+    (re.compile(r'\bauc\s*last\b|\bauc\s*\(?0-t\)?'), 'AUClast'),
+    (re.compile(r'\bauc'), 'AUC'),
+    (re.compile(r'\bc\s?max\b|peak concentration|maximum concentration'), 'Cmax'),
+    (re.compile(r'\bt\s?max\b|time to peak|time to maximum'), 'Tmax'),
+    (re.compile(r'half[- ]?life|\bt\s?1/2\b|\bthalf\b'), 'Thalf'),
+]
+
+ANALYTE_PATTERNS = [
+    (re.compile(r'free payload|unconjugated payload'), 'Free Payload'),
+    (re.compile(r'total (?:antibody|ab)\b'), 'Total AB'),
+]
+DEFAULT_ANALYTE = 'ADC'
+
+DOSE_PATTERN = re.compile(r'\bdos(?:e|es|age|ing)\b')
+AE_PATTERN = re.compile(r'adverse|\baes?\b|incidence|toxicit|side effect|safety')
+
+# Conditions a LocalPlan cannot express; checked after PK terms and names are removed
+UNSUPPORTED_PATTERN = re.compile(
+    r"\b(?:no|not|non|none|without|missing|absent|lacks?|lacking|never|except|excluding)\b|n't\b"
+    r'|\bgrades?\b|\bdlts?\b|dose[- ]limiting|\brelated\b|\bserious\b|\bsaes?\b'
+    r'|\d|[<>=%]|\b(?:above|below|over|under|exceed\w*|greater|less|fewer|more than|at least|at most'
+    r'|threshold|higher than|lower than)\b'
+    r'|payload|linker|\btarget|antigen|conjugat'
+)
+
+# Words that may appear around the recognised terms of a locally answerable question,
+# including the usual comparison and trend wording ("how does Cmax change as the dose increases")
+FILLER_WORDS = frozenset("""
+    a about across adc adcs adverse ae aes against all along among an and any are as average between both
+    by change changes changing common compare compared comparison cohort cohorts correlate correlation
+    data decrease decreases decreasing depend depends did differ difference differences do does dosage dose
+    doses dosing down drug drugs each effect effects escalation event events experienced find for frequency
+    frequent get give go goes grow grows has have higher highest how in incidence increase increased
+    increases increasing is it level levels list lower lowest me mean measured most of on per
+    pharmacokinetic pharmacokinetics pk parameter parameters profile rate rates relationship relate reported
+    response rise rises safety scale scales seen show side summarize summary tell the their them these they
+    those toxicities toxicity trend trends two typical up value values vary versus vs was were what when
+    which with
+""".split())
+
+# Questions about graph structure beyond the cohort table
+GRAPH_PATTERN = re.compile(
+    r'\bstud(?:y|ies)\b|\btrials?\b|\btarget|antigen|\blinker|payload (?:class|agent)'
+    r'|\bdoi\b|publication|\bsource|mechanism'
+)
+
+
+@dataclass
+class LocalPlan:
+    """A query answered from the snapshot: kind is pk_compare, dose_response or ae_incidence."""
+    kind: str
+    parameter: Optional[str] = None
+    analyte: str = DEFAULT_ANALYTE
+    adcs: List[str] = field(default_factory=list)
+    events: List[str] = field(default_factory=list)
+
+    def describe(self) -> str:
+        parts = [part for part in (self.parameter, self.analyte if self.parameter else None) if part]
+        parts += self.adcs + self.events
+        return f"local:{self.kind}({'; '.join(parts)})"
+
+
+def _name_patterns(name: str) -> List[str]:
+    """Regexes for a name in full, without its parenthesised codes (e.g. 'Trastuzumab
+    deruxtecan'), by its first word (e.g. 'Belantamab') or by a code in parentheses
+    (e.g. 'DS-8201' in 'Trastuzumab deruxtecan (DS-8201)'). Longer forms come first,
+    so stripping a match never leaves part of a name behind."""
+    lowered = name.lower()
+    first = lowered.split()[0] if lowered.split() else ''
+    aliases = [alias.strip() for group in re.findall(r'\(([^)]*)\)', lowered) for alias in group.split(',')]
+    display = re.sub(r'\s*\([^)]*\)', '', lowered).strip()
+    patterns = [re.escape(lowered)]
+    if display and display != lowered:
+        patterns.append(rf'(?<![\w-]){re.escape(display)}(?![\w-])')
+    patterns += [
+        rf'(?<![\w-]){re.escape(alias)}(?![\w-])'
+        for alias in [first if len(first) >= 5 else ''] + aliases if len(alias) >= 4
+    ]
+    return patterns
+
+
+def _mentions(question: str, names: List[str]) -> List[str]:
+    """Names mentioned in the question (see _name_patterns)."""
+    return [name for name in names if any(re.search(p, question) for p in _name_patterns(name))]
+
+
+def _strip_names(question: str, names: List[str]) -> str:
+    for name in names:
+        for pattern in _name_patterns(name):
+            question = re.sub(pattern, ' ', question)
+    return question
+
+
+def _fully_supported(text: str, adcs: List[str], events: List[str]) -> bool:
+    """True if nothing but recognised terms and FILLER_WORDS is left in the question."""
+    rest = _strip_names(text, adcs + events)
+    for pattern, _ in ANALYTE_PATTERNS + PK_PATTERNS:
+        rest = pattern.sub(' ', rest)
+    if UNSUPPORTED_PATTERN.search(rest):
+        return False
+    return all(word in FILLER_WORDS for word in re.findall(r"[a-z]+", rest))
+
+
+def mentioned_parameters(question: str) -> List[str]:
+    """Canonical PK parameters the question asks about."""
+    text = question.lower()
+    found = []
+    for pattern, name in PK_PATTERNS:
+        if name not in found and pattern.search(text):
+            found.append(name)
+    # 'auc' also matches inside 'auclast'
+    if 'AUClast' in found and 'AUC' in found and not re.search(r'\bauc\b(?!\s*last)', text):
+        found.remove('AUC')
+    return found
+
+
+def resolve_entities(question: str, snapshot: CohortSnapshot) -> Dict[str, List[str]]:
+    """ADC names and AE terms the question mentions, spelled as stored in the graph."""
+    text = question.lower()
+    return {'adcs': _mentions(text, snapshot.adc_names), 'events': _mentions(text, snapshot.ae_names)}
+
+
+def route_question(question: str, snapshot: CohortSnapshot) -> Optional[LocalPlan]:
+    """Return a LocalPlan for aggregate cohort questions, or None to use Cypher."""
+    text = question.lower()
+    if GRAPH_PATTERN.search(text):
+        return None
+
+    parameter = next((name for pattern, name in PK_PATTERNS if pattern.search(text)), None)
+    analyte = next((name for pattern, name in ANALYTE_PATTERNS if pattern.search(text)), DEFAULT_ANALYTE)
+    adcs = _mentions(text, snapshot.adc_names)
+    events = _mentions(text, snapshot.ae_names)
+    if not _fully_supported(text, adcs, events):
+        return None
+
+    if parameter:
+        kind = 'dose_response' if DOSE_PATTERN.search(text) else 'pk_compare'
+        return LocalPlan(kind, parameter=parameter, analyte=analyte, adcs=adcs)
+    if events or AE_PATTERN.search(text):
+        return LocalPlan('ae_incidence', adcs=adcs, events=events)
+    return None
+
+
+def _records(frame) -> List[Dict[str, Any]]:
+    # NaN is not valid JSON
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def run_plan(plan: LocalPlan, snapshot: CohortSnapshot) -> List[Dict[str, Any]]:
+    """Execute a LocalPlan and return result rows shaped like Neo4j records."""
+    if plan.kind == 'ae_incidence':
+        frame = snapshot.ae.dropna(subset=['event'])
+        if plan.adcs:
+            frame = frame[frame['ADC_Name'].isin(plan.adcs)]
+        if plan.events:
+            frame = frame[frame['event'].isin(plan.events)]
+        result = (
+            frame.groupby(['ADC_Name', 'event'], sort=True)
+            .agg(cohorts=('Dosage', 'nunique'), mean_percent=('percent', 'mean'),
+                 max_percent=('percent', 'max'), patients=('count', 'sum'))
+            .round(2).reset_index()
+        )
+        return _records(result)
+
+    frame = snapshot.pk[(snapshot.pk['parameter'] == plan.parameter)
+                        & (snapshot.pk['analyte'] == plan.analyte)].dropna(subset=['value'])
+    if plan.adcs:
+        frame = frame[frame['ADC_Name'].isin(plan.adcs)]
+
+    if plan.kind == 'dose_response':
+        result = (
+            frame.groupby(['ADC_Name', 'dose', 'unit'], sort=True)
+            .agg(Dosage=('Dosage', 'first'), value=('value', 'mean'))
+            .round(4).reset_index()
+        )
+        return _records(result[['ADC_Name', 'Dosage', 'dose', 'value', 'unit']])
+
+    if plan.kind == 'pk_compare':
+        result = (
+            frame.groupby(['ADC_Name', 'unit'], sort=True)
+            .agg(cohorts=('Dosage', 'nunique'), mean=('value', 'mean'),
+                 min=('value', 'min'), max=('value', 'max'))
+            .round(4).reset_index()
+        )
+        result.insert(1, 'parameter', plan.parameter)
+        result.insert(2, 'analyte', plan.analyte)
+        return _records(result)
+
+    raise ValueError(f"Unknown local plan: {plan.kind}")
@@ -0,0 +1,48 @@
+"""
+PK unit conversion shared by the plots and the analytics module.
+
+Each factor is the value of one unit expressed in the base unit (µg/mL for Cmax,
+µg*day/mL for AUC), so value_in_base = value * factor.
+"""
+from typing import List
+
+# Unit conversion factors
+UNIT_CONVERSIONS = {
+    'Cmax': {
+        'µg/mL': 1.0,
+        'mg/mL': 1000.0,
+        'ng/mL': 0.001,
+        'g/L': 1000.0
+    },
+    'AUC': {
+        'µg*day/mL': 1.0,
+        'mg*day/mL': 1000.0,
+        'ng*day/mL': 0.001,
+        'g*day/L': 1000.0
+    }
+}
+
+BASE_UNITS = {
+    'Cmax': 'µg/mL',
+    'AUC': 'µg*day/mL',
+}
+
+def convert_unit(value: float, from_unit: str, to_unit: str, param_type: str) -> float:
+    """Convert a value from one unit to another for a given parameter type."""
+    if from_unit == to_unit:
+        return value
+    
+    if param_type not in UNIT_CONVERSIONS:
+        return value
+    
+    conversions = UNIT_CONVERSIONS[param_type]
+    if from_unit not in conversions or to_unit not in conversions:
+        return value
+    
+    # Convert to base unit first, then to target unit
+    base_value = value * conversions[from_unit]
+    return base_value / conversions[to_unit]
+
+def get_available_units(param_type: str) -> List[str]:
+    """Get list of available units for a parameter type."""
+    return list(UNIT_CONVERSIONS.get(param_type, {}).keys())
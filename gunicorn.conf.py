@@ -0,0 +1,32 @@
+"""
+gunicorn settings for production.
+
+    gunicorn main:app -c gunicorn.conf.py
+
+The app is preloaded: heavy modules are imported and templates compiled once in
+the master, and workers fork with that done. Connections are opened lazily in
+each worker, so a worker restarted after a timeout kill boots in well under a second.
+
+Each worker runs a memory watchdog (app/core/memory.py). Past MEMORY_LIMIT_MB it
+drains and exits through a graceful SIGTERM, and the master forks a replacement.
+max_requests is a backstop for slow growth the watchdog does not catch.
+"""
+import os
+
+# Must be set before the app modules read their settings
+os.environ.setdefault("MEMORY_LIMIT_MB", "1024")
+os.environ.setdefault("MEMORY_RECYCLE", "true")
+
+from app.core.resources import preload
+
+bind = "0.0.0.0:8000"
+workers = 4
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+graceful_timeout = 30
+max_requests = 5000
+max_requests_jitter = 500
+
+
+def on_starting(server):
+    preload()
@@ -0,0 +1,57 @@
+import pytest
+
+from app.models.cohort import AdverseEvent, CohortRow, PKValue
+from app.services.cohort_snapshot import build_snapshot
+from app.services.query_router import LocalPlan, route_question
+
+DS8201 = 'Trastuzumab deruxtecan (DS-8201)'
+SG = 'Sacituzumab govitecan (SG, IMMU-132)'
+
+
+@pytest.fixture(scope='module')
+def snapshot():
+    rows = []
+    for adc in (DS8201, SG):
+        for dose in ('1.6 mg/kg', '3.2 mg/kg', '6.4 mg/kg'):
+            rows.append(CohortRow(
+                ADC_Name=adc,
+                Dosage=dose,
+                PK_Parameters=[
+                    PKValue('Cmax', 'ADC', '120.5', 'µg/mL'),
+                    PKValue('AUC', 'ADC', '410.2', 'µg*day/mL'),
+                ],
+                Adverse_Events=[
+                    AdverseEvent('Nausea', grade='1', count='4', percent='25%'),
+                    AdverseEvent('Neutropenia', grade='3', count='2', percent='12.5%'),
+                ],
+            ))
+    return build_snapshot(rows)
+
+
+@pytest.mark.parametrize('question, kind, adcs', [
+    ('How does Cmax change with dose?', 'dose_response', []),
+    ('How does Cmax change as the dose increases?', 'dose_response', []),
+    ('Compare the Cmax values for Trastuzumab deruxtecan and Sacituzumab govitecan', 'pk_compare', [DS8201, SG]),
+    ('Compare the Cmax values for two ADCs', 'pk_compare', []),
+    ('What is the AE incidence by ADC?', 'ae_incidence', []),
+    ('What is the incidence of Nausea for DS-8201?', 'ae_incidence', [DS8201]),
+])
+def test_aggregate_questions_route_locally(snapshot, question, kind, adcs):
+    plan = route_question(question, snapshot)
+    assert isinstance(plan, LocalPlan)
+    assert plan.kind == kind
+    assert sorted(plan.adcs) == sorted(adcs)
+
+
+@pytest.mark.parametrize('question', [
+    'Find cohorts with no adverse events.',
+    'Cohorts where Cmax is missing',
+    'Grade 3+ adverse events associated with a specific payload',
+    'Dose-Limiting Toxicities (DLTs) for Trastuzumab deruxtecan',
+    'Neutropenia above 10% at doses below 2 mg/kg',
+    'Which ADCs have a Cmax greater than 100?',
+    'List drug-related adverse events',
+    'Cmax of ADCs targeting HER2',
+])
+def test_conditional_questions_use_cypher(snapshot, question):
+    assert route_question(question, snapshot) is None